@@ -1,43 +1,94 @@
+import threading
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 import streamlit as st
 
+GSS_SCOPES = [
+    'https://spreadsheets.google.com/feeds',
+    'https://www.googleapis.com/auth/drive.metadata.readonly'
+]
+
+_token_lock = threading.Lock()
+
+def get_credentials_info():
+    """
+    Build the service account credentials dict from Streamlit secrets.
+
+    Returns:
+        dict: The service account credentials info
+    """
+    return {
+        "type": st.secrets["gcp_service_account"]["type"],
+        "project_id": st.secrets["gcp_service_account"]["project_id"],
+        "private_key_id": st.secrets["gcp_service_account"]["private_key_id"],
+        "private_key": st.secrets["gcp_service_account"]["private_key"],
+        "client_email": st.secrets["gcp_service_account"]["client_email"],
+        "client_id": st.secrets["gcp_service_account"]["client_id"],
+        "auth_uri": st.secrets["gcp_service_account"]["auth_uri"],
+        "token_uri": st.secrets["gcp_service_account"]["token_uri"],
+        "auth_provider_x509_cert_url": st.secrets["gcp_service_account"]["auth_provider_x509_cert_url"],
+        "client_x509_cert_url": st.secrets["gcp_service_account"]["client_x509_cert_url"]
+    }
+
+@st.cache_resource
+def get_client():
+    """
+    Get the process-wide authorized Google Sheets client.
+
+    The client and its HTTP session are created once and shared by all
+    sessions and threads, so each sheet open reuses the same connection pool
+    and access token.
+
+    Returns:
+        gspread.Client: The authorized client
+    """
+    credentials = ServiceAccountCredentials.from_json_keyfile_dict(get_credentials_info(), GSS_SCOPES)
+    return gspread.authorize(credentials)
+
+def ensure_valid_token(client):
+    """
+    Refresh the client's access token only when it is missing or expired.
+
+    Args:
+        client (gspread.Client): The pooled client
+    """
+    if client.auth.valid:
+        return
+    with _token_lock:
+        if not client.auth.valid:
+            client.login()
+
+def open_by_url(url):
+    """
+    Open a spreadsheet through the pooled client.
+
+    Args:
+        url (str): The Google Sheets URL
+
+    Returns:
+        gspread.Spreadsheet: The spreadsheet object
+    """
+    client = get_client()
+    ensure_valid_token(client)
+    return client.open_by_url(url)
+
 def authenticate(url):
     """
     Authenticate with Google Sheets using service account credentials from Streamlit secrets.
-    
+
     Args:
         url (str): The Google Sheets URL
-        
+
     Returns:
         gspread.Spreadsheet: The authenticated spreadsheet object
     """
-    gss_scopes = ['https://spreadsheets.google.com/feeds']
-    
-    # Load credentials from Streamlit secrets
     try:
-        credentials_info = {
-            "type": st.secrets["gcp_service_account"]["type"],
-            "project_id": st.secrets["gcp_service_account"]["project_id"],
-            "private_key_id": st.secrets["gcp_service_account"]["private_key_id"],
-            "private_key": st.secrets["gcp_service_account"]["private_key"],
-            "client_email": st.secrets["gcp_service_account"]["client_email"],
-            "client_id": st.secrets["gcp_service_account"]["client_id"],
-            "auth_uri": st.secrets["gcp_service_account"]["auth_uri"],
-            "token_uri": st.secrets["gcp_service_account"]["token_uri"],
-            "auth_provider_x509_cert_url": st.secrets["gcp_service_account"]["auth_provider_x509_cert_url"],
-            "client_x509_cert_url": st.secrets["gcp_service_account"]["client_x509_cert_url"]
-        }
-        
-        credentials = ServiceAccountCredentials.from_json_keyfile_dict(credentials_info, gss_scopes)
-        gss_client = gspread.authorize(credentials)
-        sheet = gss_client.open_by_url(url)
-        return sheet
-        
+        return open_by_url(url)
+
     except KeyError as e:
         st.error(f"Missing secret key: {e}")
         st.error("Please configure your Google Sheets service account credentials in Streamlit secrets.")
         st.stop()
     except Exception as e:
         st.error(f"Authentication error: {e}")
-        st.stop()
\ No newline at end of file
+        st.stop()
@@ -0,0 +1,118 @@
+"""What-if adjustment engine over the welfare dataset."""
+
+import hashlib
+from typing import Iterable, List, Tuple
+import numpy as np
+import streamlit as st
+from components.dataset import DIMENSIONS, WelfareDataset
+from constants import (
+    NUMERIC_COLUMNS,
+    COLUMN_NAME_MAPPING,
+    COUNTRY_NAME,
+    CLASS_B_COSTS,
+    MATRIX_PART_COLUMNS,
+    MATRIX_PART_TOTALS
+)
+
+OPERATIONS = ['multiply', 'add']
+
+# Program columns that can be adjusted; the part totals are recomputed from them
+ADJUSTABLE_COLUMNS = [col for col in NUMERIC_COLUMNS if col not in MATRIX_PART_TOTALS.values()]
+
+# (column, operation, amount, scope); the scope holds (dimension, sorted values) filters
+# in dimension order, and is empty for an adjustment of every row
+Adjustment = Tuple[str, str, float, Tuple[Tuple[str, Tuple[str, ...]], ...]]
+
+# Sign each column is stored with where its value is 0: costs are negative, as displayed
+STORED_SIGNS = np.array([-1.0 if col in CLASS_B_COSTS else 1.0 for col in NUMERIC_COLUMNS])
+
+def make_adjustment(column: str, operation: str, amount: float, **scope: Iterable) -> Adjustment:
+    """Build a normalized adjustment, e.g. make_adjustment('rent', 'multiply', 1.1, country=['JPN']).
+
+    Args:
+        column: Program column to adjust
+        operation: 'multiply' scales values by the amount, 'add' adds the amount to their
+            magnitude (so adding to a cost makes it larger)
+        amount: Factor or addend
+        scope: Dimension values of the rows to adjust, as in WelfareQuery.where (default every row)
+
+    Returns:
+        The adjustment tuple
+    """
+    if column not in ADJUSTABLE_COLUMNS:
+        raise ValueError(f"Cannot adjust column: {column}")
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {operation}")
+    filters = []
+    for dimension, values in scope.items():
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
+        if isinstance(values, (str, int)):
+            values = [values]
+        values = tuple(sorted(str(value) for value in values))
+        if values:
+            filters.append((dimension, values))
+    return (column, operation, float(amount), tuple(sorted(filters, key=lambda item: DIMENSIONS.index(item[0]))))
+
+def describe_adjustment(adjustment: Adjustment) -> str:
+    """Describe an adjustment for display, e.g. "Housing rent × 1.1 (Japan)"."""
+    column, operation, amount, scope = adjustment
+    sign = '×' if operation == 'multiply' else '+'
+    text = f"{COLUMN_NAME_MAPPING.get(column, column)} {sign} {amount:g}"
+    if scope:
+        text += " (" + "; ".join(
+            ", ".join(COUNTRY_NAME.get(value, value) if dimension == 'country' else f"{dimension} {value}"
+                      for value in values)
+            for dimension, values in scope
+        ) + ")"
+    return text
+
+def apply_adjustments(dataset: WelfareDataset, adjustments: List[Adjustment]) -> WelfareDataset:
+    """Apply adjustments, in order, to every row of a dataset.
+
+    The adjustments are first composed into one per-cell scale and offset,
+    which are applied to the magnitudes of the values in a single broadcast
+    before each value gets its sign back; as in compute_derived, benefits
+    and costs are magnitudes, so adding to a cost that is stored as a
+    negative value makes it larger. Missing cells are left as they are.
+    Each part total then changes by the sum of its program columns'
+    changes, and the derived columns are recomputed from the adjusted
+    values.
+
+    Returns:
+        A dataset sharing the categories and codes, with a version derived
+        from the baseline version and the adjustments
+    """
+    scale = np.ones(dataset.values.shape)
+    offset = np.zeros(dataset.values.shape)
+    for column, operation, amount, scope in adjustments:
+        rows = dataset.bitmap_index.match(dict(scope))
+        i = NUMERIC_COLUMNS.index(column)
+        if operation == 'multiply':
+            scale[rows, i] *= amount
+            offset[rows, i] *= amount
+        else:
+            offset[rows, i] += amount
+
+    signs = np.where(dataset.values != 0, np.sign(dataset.values), STORED_SIGNS)
+    magnitudes = np.abs(dataset.values) * scale + offset
+    adjusted = np.where(dataset.missing, dataset.values, signs * magnitudes)
+    changes = adjusted - dataset.values
+    for part, total_column in MATRIX_PART_TOTALS.items():
+        total = NUMERIC_COLUMNS.index(total_column)
+        part_changes = changes[:, [NUMERIC_COLUMNS.index(col) for col in MATRIX_PART_COLUMNS[part]]].sum(axis=1)
+        adjusted[:, total] = np.where(dataset.missing[:, total], adjusted[:, total], adjusted[:, total] + part_changes)
+
+    digest = hashlib.blake2b(dataset.version.encode(), digest_size=16)
+    digest.update(repr(adjustments).encode())
+    return WelfareDataset(dataset.categories, dataset.codes, np.ascontiguousarray(adjusted), dataset.missing,
+                          digest.hexdigest())
+
+@st.cache_resource(max_entries=8)
+def _cached_adjusted_dataset(_dataset: WelfareDataset, version: str,
+                             adjustments: Tuple[Adjustment, ...]) -> WelfareDataset:
+    return apply_adjustments(_dataset, list(adjustments))
+
+def get_adjusted_dataset(dataset: WelfareDataset, adjustments: List[Adjustment]) -> WelfareDataset:
+    """Get a dataset with adjustments applied, computed once per dataset version and adjustment set."""
+    return _cached_adjusted_dataset(dataset, dataset.version, tuple(adjustments))
@@ -0,0 +1,135 @@
+"""Group-by aggregation engine over the welfare dataset."""
+
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import streamlit as st
+from components.dataset import DIMENSIONS, RESULT_COLUMNS, WelfareDataset
+from components.query import convert_result_rows
+
+# Named statistics; percentiles are written as 'p<q>', e.g. 'p90'
+STATISTICS = ['mean', 'median', 'min', 'max', 'p10', 'p25', 'p75', 'p90']
+
+def parse_percentile(statistic: str) -> Optional[float]:
+    """Get the percentile (0-100) a statistic stands for, or None if it is not a percentile."""
+    if statistic == 'median':
+        return 50.0
+    if statistic.startswith('p'):
+        try:
+            q = float(statistic[1:])
+        except ValueError:
+            return None
+        if 0 <= q <= 100:
+            return q
+    return None
+
+def grouped_percentiles(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Linearly interpolated percentiles of every group at once.
+
+    Args:
+        sorted_values: (rows x columns) values sorted within each group, NaN last
+        starts: First row of each group
+        counts: (groups x columns) number of non-missing values
+        q: Percentile between 0 and 100
+
+    Returns:
+        (groups x columns) percentiles, NaN for groups without values
+    """
+    position = (counts - 1).clip(min=0) * (q / 100.0)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.ceil(position).astype(np.intp)
+    columns = np.arange(sorted_values.shape[1])
+    low_values = sorted_values[starts[:, np.newaxis] + lower, columns]
+    high_values = sorted_values[starts[:, np.newaxis] + upper, columns]
+    result = low_values + (high_values - low_values) * (position - lower)
+    return np.where(counts > 0, result, np.nan)
+
+def compute_aggregates(dataset: WelfareDataset, group_by: List[str], statistics: List[str],
+                       positions: Optional[np.ndarray] = None, rate_type: Optional[str] = None) -> pd.DataFrame:
+    """Aggregate every numeric and derived column by groups of dimension values.
+
+    Rows are sorted by their group codes once; sums, minima and maxima are
+    then reduced per group with ufunc.reduceat, and percentiles are read from
+    values sorted within each group. Missing cells are ignored.
+
+    Args:
+        dataset: The typed dataset
+        group_by: Dimensions to group by (none aggregates all rows together)
+        statistics: Names from STATISTICS, or any 'p<q>' percentile
+        positions: Rows to aggregate (default all rows)
+        rate_type: Exchange rate type each row is converted with before aggregating
+
+    Returns:
+        Frame indexed by the group values, with (statistic, column) columns
+    """
+    for dimension in group_by:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
+    for statistic in statistics:
+        if statistic not in ('mean', 'min', 'max') and parse_percentile(statistic) is None:
+            raise ValueError(f"Unknown statistic: {statistic}")
+
+    if positions is None:
+        positions = np.arange(len(dataset))
+    values = np.where(dataset.result_missing[positions], np.nan, dataset.result_values[positions])
+
+    values, _ = convert_result_rows(dataset, values, rate_type, positions)
+
+    # Group rows by their codes in the grouping dimensions
+    group_codes = dataset.codes[np.ix_(positions, [DIMENSIONS.index(dimension) for dimension in group_by])]
+    keys, group_ids = np.unique(group_codes, axis=0, return_inverse=True)
+    group_ids = group_ids.ravel()
+
+    order = np.argsort(group_ids, kind='stable')
+    grouped = values[order]
+    starts = np.searchsorted(group_ids[order], np.arange(len(keys)))
+    present = ~np.isnan(grouped)
+    counts = np.add.reduceat(present, starts, axis=0) if len(positions) else np.zeros((0, len(RESULT_COLUMNS)))
+
+    results = {}
+    for statistic in statistics:
+        if not len(positions):
+            results[statistic] = counts
+        elif statistic == 'mean':
+            sums = np.add.reduceat(np.where(present, grouped, 0.0), starts, axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                results[statistic] = np.where(counts > 0, sums / counts, np.nan)
+        elif statistic in ('min', 'max'):
+            fill = np.inf if statistic == 'min' else -np.inf
+            reduce = np.minimum if statistic == 'min' else np.maximum
+            extremes = reduce.reduceat(np.where(present, grouped, fill), starts, axis=0)
+            results[statistic] = np.where(counts > 0, extremes, np.nan)
+        else:
+            # Sort each column within its group; NaN sorts last so the first `counts` values are present
+            group_column = np.broadcast_to(group_ids[order][:, np.newaxis], grouped.shape)
+            within = np.lexsort((grouped, group_column), axis=0)
+            sorted_values = np.take_along_axis(grouped, within, axis=0)
+            results[statistic] = grouped_percentiles(sorted_values, starts, counts, parse_percentile(statistic))
+
+    if group_by:
+        index = pd.MultiIndex.from_arrays(
+            [np.asarray(dataset.categories[dimension], dtype=object)[keys[:, i]] for i, dimension in enumerate(group_by)],
+            names=group_by
+        )
+    else:
+        index = pd.Index(['All'] * len(keys))
+    frames = [pd.DataFrame(results[statistic], index=index, columns=RESULT_COLUMNS) for statistic in statistics]
+    return pd.concat(frames, axis=1, keys=statistics)
+
+@st.cache_data(max_entries=32)
+def _cached_aggregates(_dataset: WelfareDataset, version: str, group_by: Tuple[str, ...], statistics: Tuple[str, ...],
+                       positions: Optional[Tuple[int, ...]], rate_type: Optional[str]) -> pd.DataFrame:
+    return compute_aggregates(
+        _dataset, list(group_by), list(statistics),
+        None if positions is None else np.array(positions, dtype=np.intp),
+        rate_type
+    )
+
+def get_aggregates(dataset: WelfareDataset, group_by: List[str], statistics: List[str],
+                   positions: Optional[np.ndarray] = None, rate_type: Optional[str] = None) -> pd.DataFrame:
+    """Cached compute_aggregates, keyed by dataset version and the aggregation parameters."""
+    return _cached_aggregates(
+        dataset, dataset.version, tuple(group_by), tuple(statistics),
+        None if positions is None else tuple(int(position) for position in positions),
+        rate_type
+    )
@@ -0,0 +1,136 @@
+"""Pluggable worksheet data backends for the Global Welfare Dashboard."""
+
+import csv
+import glob
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, Dict, Any
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import streamlit as st
+from components.dataset import WelfareDataset, build_dataset, build_dataset_from_table
+from components.sheet_loader import sync_all_shards
+from components.snapshot_store import get_snapshot_path, read_snapshot, write_snapshot, is_snapshot_fresh
+from constants import SHEET_SHARDS, SNAPSHOT_SETTINGS, DATA_SOURCE, MESSAGES
+
+def format_timestamp(timestamp: float) -> str:
+    """Format a Unix timestamp for display."""
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+
+def table_to_rows(table: pa.Table) -> List[List[str]]:
+    """Convert an Arrow table to worksheet rows of strings, with nulls as ''."""
+    columns = [
+        pc.fill_null(pc.cast(column, pa.string()), '').to_pylist()
+        for column in table.columns
+    ]
+    return [list(row) for row in zip(*columns)]
+
+class DataSource(ABC):
+    """Base class for backends that provide worksheet rows without a header."""
+
+    @abstractmethod
+    def load_rows(self) -> List[List[str]]:
+        """Load all data rows."""
+
+    def load_dataset(self) -> WelfareDataset:
+        """Load all data rows into a typed dataset."""
+        return build_dataset(self.load_rows())
+
+    def refresh(self) -> str:
+        """Pick up upstream changes and return a status message."""
+        return MESSAGES['source_reloaded']
+
+    @abstractmethod
+    def describe(self) -> str:
+        """Describe the backend for display."""
+
+class GoogleSheetsSource(DataSource):
+    """Google Sheets shards, served from a local snapshot while it is fresh."""
+
+    def __init__(self, shards: Dict[str, Dict[str, Any]] = None):
+        self.shards = SHEET_SHARDS if shards is None else shards
+        self.snapshot_name = SNAPSHOT_SETTINGS['sheet_snapshot']
+
+    def load_rows(self) -> List[List[str]]:
+        snapshot = read_snapshot(self.snapshot_name)
+        if snapshot is not None and is_snapshot_fresh(snapshot[1]):
+            return snapshot[0]
+
+        try:
+            combined_data, _ = sync_all_shards(self.shards)
+        except Exception as e:
+            if snapshot is None:
+                raise
+            st.warning(MESSAGES['snapshot_fallback'].format(e, format_timestamp(snapshot[1])))
+            return snapshot[0]
+
+        try:
+            write_snapshot(self.snapshot_name, combined_data)
+        except OSError as e:
+            st.warning(f"Could not write data snapshot: {e}")
+
+        return combined_data
+
+    def refresh(self) -> str:
+        combined_data, changed_shards = sync_all_shards(self.shards)
+        write_snapshot(self.snapshot_name, combined_data)
+        return MESSAGES['data_refreshed'].format(len(changed_shards), len(self.shards))
+
+    def describe(self) -> str:
+        snapshot_path = get_snapshot_path(self.snapshot_name)
+        if not os.path.exists(snapshot_path):
+            return "Google Sheets"
+        return f"Google Sheets (snapshot from {format_timestamp(os.path.getmtime(snapshot_path))})"
+
+class CsvDirectorySource(DataSource):
+    """A local directory of CSV exports, each with a header row."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def load_rows(self) -> List[List[str]]:
+        rows = []
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.csv'))):
+            with open(path, newline='', encoding='utf-8') as f:
+                rows.extend(list(csv.reader(f))[1:])
+        return rows
+
+    def describe(self) -> str:
+        return f"CSV directory {self.directory}"
+
+class ArrowFileSource(DataSource):
+    """A local Parquet or Arrow IPC (Feather) file in long format."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read_table(self) -> pa.Table:
+        """Read the file as an Arrow table."""
+        if self.path.endswith(('.arrow', '.feather')):
+            return feather.read_table(self.path)
+        return pq.read_table(self.path)
+
+    def load_rows(self) -> List[List[str]]:
+        return table_to_rows(self.read_table())
+
+    def load_dataset(self) -> WelfareDataset:
+        # Typed columns go straight into the dataset, skipping the string round-trip
+        return build_dataset_from_table(self.read_table())
+
+    def describe(self) -> str:
+        return f"Local file {self.path}"
+
+@st.cache_resource
+def get_data_source() -> DataSource:
+    """Create the data source selected by the DATA_SOURCE configuration."""
+    backend = DATA_SOURCE['backend']
+    if backend == 'google_sheets':
+        return GoogleSheetsSource()
+    if backend == 'csv':
+        return CsvDirectorySource(DATA_SOURCE['csv_dir'])
+    if backend in ('parquet', 'arrow'):
+        return ArrowFileSource(DATA_SOURCE['file_path'])
+    raise ValueError(f"Unknown data source backend: {backend}")
@@ -0,0 +1,311 @@
+"""Typed in-memory dataset for the Global Welfare Dashboard."""
+
+import hashlib
+from functools import cached_property
+from typing import List, Dict, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from constants import NUMERIC_COLUMNS, COLUMN_INDICES, NUMERIC_START_INDEX, CLASS_A_BENEFITS, CLASS_B_COSTS, DERIVED_COLUMNS
+
+DIMENSIONS = list(COLUMN_INDICES)
+
+# Numeric columns followed by the derived columns
+RESULT_COLUMNS = NUMERIC_COLUMNS + DERIVED_COLUMNS
+
+BENEFIT_POSITIONS = [NUMERIC_COLUMNS.index(col) for col in CLASS_A_BENEFITS]
+COST_POSITIONS = [NUMERIC_COLUMNS.index(col) for col in CLASS_B_COSTS]
+EARNING_POSITION = NUMERIC_COLUMNS.index('earning')
+
+def category_sort_key(value: str) -> Tuple[int, int, str]:
+    """Sort key placing integer-like values first, in numeric order."""
+    stripped = value.strip()
+    if stripped.lstrip('-').isdigit():
+        return (0, int(stripped), value)
+    return (1, 0, value)
+
+def sort_dictionary(stored: List[str], indices: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    """Turn a dictionary-encoded column into sorted categories and their int16 codes.
+
+    Args:
+        stored: Dictionary values, in stored order
+        indices: Dictionary index of every row
+
+    Returns:
+        Tuple of (categories sorted with category_sort_key, code of every row)
+    """
+    categories = sorted(stored, key=category_sort_key)
+    sorted_codes = {value: code for code, value in enumerate(categories)}
+    remap = np.array([sorted_codes[value] for value in stored], dtype=np.int16)
+    codes = remap[indices] if len(stored) else np.zeros(len(indices), dtype=np.int16)
+    return categories, codes
+
+def content_version(categories: Dict[str, List[str]], codes: np.ndarray, values: np.ndarray,
+                    missing: np.ndarray) -> str:
+    """Hash the typed content of a dataset, so the same data gets the same version from every backend."""
+    digest = hashlib.blake2b(digest_size=16)
+    for dimension in DIMENSIONS:
+        digest.update('\x1f'.join(categories[dimension]).encode())
+        digest.update(b'\x1e')
+    for array in (codes, values, missing):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+def compute_derived(values: np.ndarray) -> np.ndarray:
+    """Compute the DERIVED_COLUMNS of every row in one vectorized pass.
+
+    Benefits and costs are taken as magnitudes, as they are displayed.
+    Ratios are NaN where their denominator is 0.
+
+    Args:
+        values: (rows x NUMERIC_COLUMNS) matrix
+
+    Returns:
+        (rows x DERIVED_COLUMNS) matrix
+    """
+    benefits = np.abs(values[:, BENEFIT_POSITIONS]).sum(axis=1)
+    costs = np.abs(values[:, COST_POSITIONS]).sum(axis=1)
+    earnings = np.abs(values[:, EARNING_POSITION])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        replacement = np.where(earnings != 0, (benefits - earnings) / earnings, np.nan)
+        burden = np.where(benefits != 0, costs / benefits, np.nan)
+
+    return np.column_stack([benefits - costs, replacement, burden])
+
+class WelfareDataset:
+    """Worksheet rows converted once into categorical codes and a numeric matrix.
+
+    Attributes:
+        categories: Sorted category values of each dimension
+        codes: (rows x DIMENSIONS) int16 matrix of category codes
+        values: (rows x NUMERIC_COLUMNS) C-contiguous float64 matrix, 0 where missing
+        missing: Boolean mask of missing or unparseable numeric cells
+        version: Content hash identifying the data
+        derived: (rows x DERIVED_COLUMNS) matrix computed from values, NaN where undefined
+    """
+
+    def __init__(self, categories: Dict[str, List[str]], codes: np.ndarray,
+                 values: np.ndarray, missing: np.ndarray, version: str):
+        self.categories = categories
+        self.codes = codes
+        self.values = values
+        self.missing = missing
+        self.version = version
+        self.derived = compute_derived(values)
+        self.category_codes = {
+            dimension: {value: code for code, value in enumerate(dimension_values)}
+            for dimension, dimension_values in categories.items()
+        }
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def dimension_codes(self, dimension: str) -> np.ndarray:
+        """Get the category code of every row for a dimension."""
+        return self.codes[:, DIMENSIONS.index(dimension)]
+
+    def encode(self, dimension: str, value) -> int:
+        """Get the category code of a value, or -1 if it does not occur."""
+        return self.category_codes[dimension].get(str(value), -1)
+
+    def decode(self, dimension: str, code: int) -> str:
+        """Get the category value of a code."""
+        return self.categories[dimension][code]
+
+    def options(self, dimension: str, mask: Optional[np.ndarray] = None) -> List[str]:
+        """Get the non-empty values of a dimension present in the (masked) rows, in category order."""
+        codes = self.dimension_codes(dimension)
+        if mask is not None:
+            codes = codes[mask]
+        return [self.categories[dimension][code] for code in np.unique(codes) if self.categories[dimension][code]]
+
+    @cached_property
+    def result_values(self) -> np.ndarray:
+        """(rows x RESULT_COLUMNS) C-contiguous matrix of the numeric and derived columns."""
+        return np.ascontiguousarray(np.hstack([self.values, self.derived]))
+
+    @cached_property
+    def result_missing(self) -> np.ndarray:
+        """Missing mask of result_values: missing numeric cells and undefined derived values."""
+        return np.hstack([self.missing, np.isnan(self.derived)])
+
+    @cached_property
+    def key_index(self) -> Dict[Tuple[str, ...], int]:
+        """Map each (country, incomecase, familytype, incomegender, case, alternative) key to its first row."""
+        columns = [
+            np.asarray(self.categories[dimension], dtype=object)[self.codes[:, i]]
+            for i, dimension in enumerate(DIMENSIONS)
+        ]
+        keys = list(zip(*columns))
+        # Insert in reverse so the first row of a duplicated key wins
+        return dict(zip(reversed(keys), range(len(keys) - 1, -1, -1)))
+
+    @cached_property
+    def combination_catalog(self) -> Dict[str, List[Tuple[str, ...]]]:
+        """Map each country to its distinct (country, incomecase, familytype, incomegender, case, alternative) keys.
+
+        Built in one grouped pass over the code matrix; keys with a blank
+        value are left out, and each country's keys are in category order.
+        """
+        catalog: Dict[str, List[Tuple[str, ...]]] = {}
+        for combo in np.unique(self.codes, axis=0):
+            values = tuple(self.categories[dimension][code] for dimension, code in zip(DIMENSIONS, combo))
+            if all(values):
+                catalog.setdefault(values[0], []).append(values)
+        return catalog
+
+    @cached_property
+    def facet_tree(self) -> Dict[str, dict]:
+        """Nested facet tree: country -> incomecase -> familytype -> incomegender -> case -> alternatives.
+
+        Built from the combination catalog, so every level is in category order.
+        """
+        tree: Dict[str, dict] = {}
+        for keys in self.combination_catalog.values():
+            for values in keys:
+                node = tree
+                for value in values[:-2]:
+                    node = node.setdefault(value, {})
+                node.setdefault(values[-2], []).append(values[-1])
+        return tree
+
+    @cached_property
+    def bitmap_index(self) -> 'BitmapIndex':
+        """Per-dimension value bitsets for multi-value filters."""
+        return BitmapIndex(self)
+
+class BitmapIndex:
+    """Boolean row bitsets for every category value of every dimension.
+
+    Filters map dimensions to lists of accepted values. Values of one
+    dimension are OR-ed together and dimensions are AND-ed; a dimension that
+    is missing from the filters or has an empty list accepts every row.
+
+    Attributes:
+        bitsets: Per dimension, a (categories x rows) boolean matrix
+    """
+
+    def __init__(self, dataset: WelfareDataset):
+        self.dataset = dataset
+        self.bitsets = {
+            dimension: dataset.dimension_codes(dimension)[np.newaxis, :]
+                       == np.arange(len(dataset.categories[dimension]))[:, np.newaxis]
+            for dimension in DIMENSIONS
+        }
+
+    def bitset(self, dimension: str, values: Iterable) -> np.ndarray:
+        """Get the rows holding any of the values in a dimension."""
+        codes = [code for code in (self.dataset.encode(dimension, value) for value in values) if code >= 0]
+        return self.bitsets[dimension][codes].any(axis=0)
+
+    def match(self, filters: Dict[str, Iterable]) -> np.ndarray:
+        """Get the boolean mask of the rows passing every filter."""
+        mask = np.ones(len(self.dataset), dtype=bool)
+        for dimension, values in filters.items():
+            values = list(values)
+            if values:
+                mask &= self.bitset(dimension, values)
+        return mask
+
+    def count(self, filters: Dict[str, Iterable]) -> int:
+        """Count the rows passing every filter."""
+        return int(np.count_nonzero(self.match(filters)))
+
+    def rows(self, filters: Dict[str, Iterable]) -> np.ndarray:
+        """Get the positions of the rows passing every filter."""
+        return np.flatnonzero(self.match(filters))
+
+    def options(self, dimension: str, filters: Dict[str, Iterable]) -> List[str]:
+        """Get the non-empty values of a dimension left by the filters, in category order."""
+        present = (self.bitsets[dimension] & self.match(filters)).any(axis=1)
+        categories = self.dataset.categories[dimension]
+        return [categories[code] for code in np.flatnonzero(present) if categories[code]]
+
+    def combinations(self, filters: Dict[str, Iterable]) -> List[Tuple[str, ...]]:
+        """Get the distinct selection keys of the rows passing every filter, skipping blank values."""
+        keys = []
+        for combo in np.unique(self.dataset.codes[self.match(filters)], axis=0):
+            values = tuple(self.dataset.categories[dimension][code] for dimension, code in zip(DIMENSIONS, combo))
+            if all(values):
+                keys.append(values)
+        return keys
+
+def build_dataset(rows: List[List[str]]) -> WelfareDataset:
+    """Convert worksheet rows into a typed dataset.
+
+    Rows without a country are skipped. Numeric cells are parsed column by
+    column; blank or unparseable cells become 0 and are flagged in the
+    missing mask. The version is the content_version of the typed data.
+
+    Args:
+        rows: Worksheet rows without a header
+
+    Returns:
+        The typed dataset
+    """
+    rows = [row for row in rows if len(row) > COLUMN_INDICES['alternative'] and row[COLUMN_INDICES['country']]]
+
+    categories = {}
+    codes = np.empty((len(rows), len(DIMENSIONS)), dtype=np.int16)
+    for i, dimension in enumerate(DIMENSIONS):
+        column = [row[COLUMN_INDICES[dimension]] for row in rows]
+        categories[dimension] = sorted(set(column), key=category_sort_key)
+        codes[:, i] = pd.Categorical(column, categories=categories[dimension]).codes
+
+    numeric_end = NUMERIC_START_INDEX + len(NUMERIC_COLUMNS)
+    parsed = np.full((len(rows), len(NUMERIC_COLUMNS)), np.nan)
+    if rows:
+        # Ragged rows are padded with None, which parses as missing
+        cells = pd.DataFrame([row[NUMERIC_START_INDEX:numeric_end] for row in rows])
+        for i in cells.columns:
+            parsed[:, i] = pd.to_numeric(cells[i].str.strip(), errors='coerce')
+
+    missing = np.isnan(parsed)
+    values = np.ascontiguousarray(np.where(missing, 0.0, parsed))
+    return WelfareDataset(categories, codes, values, missing, content_version(categories, codes, values, missing))
+
+def build_dataset_from_table(table: pa.Table) -> WelfareDataset:
+    """Convert an Arrow table in worksheet column order into a typed dataset.
+
+    Dimension columns are dictionary-encoded and numeric columns are read
+    as float64 arrays directly, without converting cells to strings; only
+    numeric columns stored as text are parsed. As in build_dataset, rows
+    without a country are skipped, null or unparseable cells are flagged
+    in the missing mask, and the same data gets the same version.
+
+    Args:
+        table: Table laid out like the worksheet (COLUMN_INDICES, then NUMERIC_COLUMNS)
+
+    Returns:
+        The typed dataset
+    """
+    dimension_columns = {
+        dimension: pc.fill_null(pc.cast(table.column(COLUMN_INDICES[dimension]), pa.string()), '')
+        for dimension in DIMENSIONS
+    }
+    keep = pc.not_equal(dimension_columns['country'], '')
+    if not pc.all(keep).as_py():
+        table = table.filter(keep)
+        dimension_columns = {dimension: column.filter(keep) for dimension, column in dimension_columns.items()}
+
+    categories = {}
+    codes = np.empty((table.num_rows, len(DIMENSIONS)), dtype=np.int16)
+    for i, dimension in enumerate(DIMENSIONS):
+        encoded = pc.dictionary_encode(dimension_columns[dimension]).combine_chunks()
+        categories[dimension], codes[:, i] = sort_dictionary(
+            encoded.dictionary.to_pylist(), encoded.indices.to_numpy(zero_copy_only=False)
+        )
+
+    parsed = np.full((table.num_rows, len(NUMERIC_COLUMNS)), np.nan)
+    for i in range(min(len(NUMERIC_COLUMNS), table.num_columns - NUMERIC_START_INDEX)):
+        column = table.column(NUMERIC_START_INDEX + i)
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            parsed[:, i] = pd.to_numeric(pd.Series(column.to_pylist(), dtype=object).str.strip(), errors='coerce')
+        else:
+            parsed[:, i] = pc.cast(column, pa.float64()).to_numpy()
+
+    missing = np.isnan(parsed)
+    values = np.ascontiguousarray(np.where(missing, 0.0, parsed))
+    return WelfareDataset(categories, codes, values, missing, content_version(categories, codes, values, missing))
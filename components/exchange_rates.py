@@ -0,0 +1,89 @@
+"""Exchange rate lookups for the Global Welfare Dashboard."""
+
+import hashlib
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Exchange rate columns of exchange_rate.csv
+RATE_TYPES = ['PPP exchange rates', 'Nominal exchange rates']
+
+@st.cache_data
+def load_exchange_rates():
+    """Load exchange rate data from CSV file."""
+    try:
+        df = pd.read_csv('exchange_rate.csv')
+        return df
+    except FileNotFoundError:
+        st.error("Exchange rate file not found: exchange_rate.csv")
+        return None
+    except Exception as e:
+        st.error(f"Error loading exchange rate data: {e}")
+        return None
+
+class ExchangeRateTable:
+    """Exchange rates compiled into a dict keyed by (country code, rate type).
+
+    Attributes:
+        rate_types: Available rate types, in file column order
+        rates: Rate of each (country code, rate type) pair that has one
+        version: Content hash identifying the rates
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.rate_types = [col for col in df.columns if col in RATE_TYPES]
+        self.rates: Dict[Tuple[str, str], float] = {}
+        for rate_type in self.rate_types:
+            values = pd.to_numeric(df[rate_type].replace('', np.nan), errors='coerce')
+            for country_code, rate in zip(df['country'], values):
+                # The first row of a country wins
+                if pd.notna(rate) and (country_code, rate_type) not in self.rates:
+                    self.rates[(country_code, rate_type)] = float(rate)
+
+        digest = hashlib.blake2b(repr(sorted(self.rates.items())).encode(), digest_size=16)
+        self.version = digest.hexdigest()
+
+    def rate(self, country_code: str, rate_type: str) -> Optional[float]:
+        """Get the rate of a country, or None if it has none."""
+        return self.rates.get((country_code, rate_type))
+
+    def rates_for(self, country_codes: Iterable[str], rate_type: str) -> np.ndarray:
+        """Get the rate of every country code as a float array, NaN where there is none."""
+        return np.array([self.rates.get((code, rate_type), np.nan) for code in country_codes], dtype=float)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Get the rates as a frame with a country column and one column per rate type."""
+        countries = sorted({country_code for country_code, _ in self.rates})
+        return pd.DataFrame({
+            'country': countries,
+            **{rate_type: self.rates_for(countries, rate_type) for rate_type in self.rate_types}
+        })
+
+@st.cache_resource
+def get_rate_table() -> ExchangeRateTable:
+    """Compile the exchange rate file once per process."""
+    df = load_exchange_rates()
+    return ExchangeRateTable(df if df is not None else pd.DataFrame(columns=['countryname', 'country']))
+
+def get_exchange_rate_options():
+    """Get available exchange rate column options."""
+    return list(get_rate_table().rate_types)
+
+def get_exchange_rate_for_country(country_code, rate_type):
+    """Get exchange rate for a specific country and rate type."""
+    return get_rate_table().rate(country_code, rate_type)
+
+def format_missing_rates_warning(countries: Iterable[str], rate_type: str) -> str:
+    """Build one warning naming every country without a rate of the given type."""
+    names = sorted(set(countries))
+    return (f"No exchange rate found for {', '.join(names)} with type {rate_type}. "
+            f"Using original values for {'this country' if len(names) == 1 else 'these countries'}.")
+
+def get_available_countries_with_rates():
+    """Get list of countries available in exchange rate data."""
+    df = load_exchange_rates()
+    if df is None:
+        return []
+
+    return df[['countryname', 'country']].dropna().to_dict('records')
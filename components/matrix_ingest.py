@@ -0,0 +1,142 @@
+"""Batch ingest of Model Family Matrix CSVs into one columnar dataset.
+
+Usage:
+    python -m components.matrix_ingest DIRECTORY -o data/welfare.parquet [--workers N]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from components.matrix_parser import iter_matrix_file, record_key
+from constants import NUMERIC_COLUMNS
+
+DIMENSION_COLUMNS = ['country', 'countryname', 'incomecase', 'familytype', 'incomegender', 'case', 'alternative']
+CODE_COLUMNS = [col for col in DIMENSION_COLUMNS if col not in ('country', 'countryname')]
+
+ParsedFile = Tuple[str, List[List[str]], np.ndarray, float]
+
+def parse_file(path: str) -> ParsedFile:
+    """Parse one matrix file into dimension rows and a numeric matrix.
+
+    Args:
+        path: Path of the matrix CSV
+
+    Returns:
+        Tuple of (path, dimension rows, values matrix, elapsed seconds)
+    """
+    start = time.perf_counter()
+    dimensions = []
+    values = []
+    for record_dimensions, record_values in iter_matrix_file(path):
+        dimensions.append(record_dimensions)
+        values.append(record_values)
+
+    matrix = np.vstack(values) if values else np.empty((0, len(NUMERIC_COLUMNS)))
+    return path, dimensions, matrix, time.perf_counter() - start
+
+def find_duplicate_keys(parsed_files: List[ParsedFile]) -> List[str]:
+    """Describe every selection key that more than one record has, with the files holding it."""
+    files: Dict[Tuple[str, ...], List[str]] = {}
+    for path, rows, _, _ in parsed_files:
+        for row in rows:
+            files.setdefault(record_key(row), []).append(os.path.basename(path))
+    return [f"{'/'.join(key)} ({', '.join(paths)})" for key, paths in files.items() if len(paths) > 1]
+
+def build_table(parsed_files: List[ParsedFile]) -> pa.Table:
+    """Combine parsed files into one typed Arrow table in worksheet column order.
+
+    Raises:
+        ValueError: If records of different files share a selection key
+    """
+    duplicates = find_duplicate_keys(parsed_files)
+    if duplicates:
+        raise ValueError(f"{len(duplicates)} duplicate selection keys: {'; '.join(duplicates[:5])}"
+                         + ("; ..." if len(duplicates) > 5 else ""))
+
+    dimensions = [row for _, rows, _, _ in parsed_files for row in rows]
+    matrix = np.vstack([values for _, _, values, _ in parsed_files]) if parsed_files else np.empty((0, len(NUMERIC_COLUMNS)))
+
+    columns: Dict[str, pa.Array] = {}
+    for i, col in enumerate(DIMENSION_COLUMNS):
+        cells = [row[i] for row in dimensions]
+        if col in CODE_COLUMNS:
+            columns[col] = pa.array([int(cell) for cell in cells], type=pa.int16())
+        else:
+            columns[col] = pa.array(cells, type=pa.dictionary(pa.int16(), pa.string()))
+    for i, col in enumerate(NUMERIC_COLUMNS):
+        columns[col] = pa.array(matrix[:, i], type=pa.float64(), from_pandas=True)
+
+    return pa.table(columns)
+
+def write_table(table: pa.Table, output_path: str) -> None:
+    """Write the dataset as Arrow IPC (.arrow/.feather) or Parquet."""
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    if output_path.endswith(('.arrow', '.feather')):
+        feather.write_feather(table, output_path, compression='zstd')
+    else:
+        pq.write_table(table, output_path, compression='zstd')
+
+def ingest_directory(directory: str, output_path: str, workers: Optional[int] = None) -> pa.Table:
+    """Parse every matrix CSV in a directory in a process pool and write one dataset.
+
+    Per-file timing and overall throughput are reported on stdout.
+
+    Args:
+        directory: Directory containing matrix CSV files
+        output_path: Output Parquet or Arrow file path
+        workers: Number of worker processes (defaults to the CPU count)
+
+    Returns:
+        The combined table
+    """
+    paths = sorted(glob.glob(os.path.join(directory, '*.csv')))
+    if not paths:
+        raise FileNotFoundError(f"No CSV files found in {directory}")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parsed_files = list(executor.map(parse_file, paths))
+
+    for path, rows, _, elapsed in parsed_files:
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"{os.path.basename(path)}: {len(rows)} records in {elapsed:.3f}s "
+              f"({size_mb / elapsed if elapsed else 0:.1f} MB/s)")
+
+    table = build_table(parsed_files)
+    write_table(table, output_path)
+
+    total = time.perf_counter() - start
+    print(f"Ingested {table.num_rows} records from {len(paths)} files in {total:.3f}s "
+          f"({table.num_rows / total if total else 0:.0f} records/s) -> {output_path}")
+    return table
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the batch ingest command line."""
+    parser = argparse.ArgumentParser(
+        description="Compile a directory of Model Family Matrix CSVs into one Parquet/Arrow dataset "
+                    "(load it with WELFARE_DATA_SOURCE=parquet WELFARE_DATA_FILE=<output>)."
+    )
+    parser.add_argument('directory', help='Directory containing per-country matrix CSV files')
+    parser.add_argument('-o', '--output', default=os.path.join('data', 'welfare.parquet'),
+                        help='Output .parquet or .arrow file (default: data/welfare.parquet)')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='Number of worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    try:
+        ingest_directory(args.directory, args.output, args.workers)
+    except (FileNotFoundError, OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
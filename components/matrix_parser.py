@@ -0,0 +1,192 @@
+"""Streaming parser for upstream Model Family Matrix country workbooks."""
+
+import csv
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+import numpy as np
+import pandas as pd
+from constants import (
+    NUMERIC_COLUMNS,
+    CASES,
+    MATRIX_PART_COLUMNS,
+    MATRIX_PART_TOTALS,
+    MATRIX_FAMILY_TYPES,
+    MATRIX_INCOME_CASES,
+    MATRIX_INCOME_GENDERS
+)
+
+MatrixRecord = Tuple[List[str], np.ndarray]
+
+NUMERIC_POSITIONS = {col: i for i, col in enumerate(NUMERIC_COLUMNS)}
+CASE_CODES = {name.lower(): code for code, name in enumerate(CASES) if name}
+
+# Block header rows, labelled in their second cell, that describe each family block
+PROFILE_HEADER_LABELS = ('Type', 'Income 1', 'Income 2')
+
+def parse_numbers(cells: np.ndarray) -> np.ndarray:
+    """Convert an array of cell strings to floats, with blanks and text as NaN."""
+    return pd.to_numeric(pd.Series(cells, dtype=object).str.strip(), errors='coerce').to_numpy(dtype=float)
+
+def split_income(label: str) -> Tuple[str, str]:
+    """Split an income header label into its level and gender remark, both lower case.
+
+    E.g. 'National Average Wage (Not Gender-Specific)' gives
+    ('national average wage', 'not gender-specific'); blank and 'NA' give ('', '').
+    """
+    label = label.strip().lower()
+    if label in ('', 'na'):
+        return '', ''
+    level, _, remark = label.partition(' (')
+    return level.strip(), remark.rstrip(')').strip()
+
+def derive_block_codes(family_type: str, income_1: str, income_2: str) -> Tuple[int, int, int]:
+    """Derive a block's (incomecase, familytype, incomegender) codes from its header labels, 0 where unknown.
+
+    Earners without a gender remark, and blocks without earners, are 'not
+    applicable' (3); they defer to the remark of the other earner.
+    """
+    level_1, gender_1 = split_income(income_1)
+    level_2, gender_2 = split_income(income_2)
+    not_applicable = MATRIX_INCOME_GENDERS['']
+    genders = {MATRIX_INCOME_GENDERS.get(gender, 0) for level, gender in ((level_1, gender_1), (level_2, gender_2))
+               if level} or {not_applicable}
+    if len(genders) > 1:
+        genders.discard(not_applicable)
+    incomecase = MATRIX_INCOME_CASES.get((level_1, level_2)) or MATRIX_INCOME_CASES.get((level_2, level_1), 0)
+    return (
+        incomecase,
+        MATRIX_FAMILY_TYPES.get(family_type.strip().lower(), 0),
+        genders.pop() if len(genders) == 1 else 0
+    )
+
+class MatrixState:
+    """Accumulates the OUTPUT values of one matrix while its rows stream past."""
+
+    def __init__(self):
+        self.metadata: Dict[str, str] = {}
+        self.profile_rows: Dict[str, List[str]] = {}
+        self.block_starts: Optional[np.ndarray] = None
+        self.output_columns: Optional[np.ndarray] = None
+        self.block_cases: List[str] = []
+        self.values: Optional[np.ndarray] = None
+        self.part: Optional[str] = None
+
+    def consume(self, row: List[str]) -> None:
+        """Consume one CSV row of the matrix."""
+        label = row[0].strip() if row else ''
+
+        if self.values is None:
+            cells = np.asarray(row, dtype=object)
+            if 'OUTPUT' in row:
+                # PROGRAM/INPUT/OUTPUT/REMARK header: locate every family block at once
+                self.block_starts = np.flatnonzero(cells == 'PROGRAM')
+                self.output_columns = np.flatnonzero(cells == 'OUTPUT')
+                self.values = np.full((len(self.output_columns), len(NUMERIC_COLUMNS)), np.nan)
+                self.block_cases = [''] * len(self.output_columns)
+            elif len(row) > 1 and row[1].strip() in PROFILE_HEADER_LABELS:
+                self.profile_rows[row[1].strip()] = row
+            elif label and len(row) > 1:
+                self.metadata[label] = row[1].strip()
+            return
+
+        if label in MATRIX_PART_COLUMNS:
+            self.part = label
+            self.read_block_header(row)
+        elif label == 'END':
+            self.part = None
+        elif self.part is not None and label.isdigit():
+            part_columns = MATRIX_PART_COLUMNS[self.part]
+            program = int(label) - 1
+            if program < len(part_columns):
+                cells = np.asarray(row + [''] * (self.output_columns[-1] + 1 - len(row)), dtype=object)
+                self.values[:, NUMERIC_POSITIONS[part_columns[program]]] = parse_numbers(cells[self.output_columns])
+
+    def read_block_header(self, row: List[str]) -> None:
+        """Read each block's case label from a PART header row."""
+        for block, start in enumerate(self.block_starts):
+            if start + 1 < len(row) and row[start].strip() == 'Family Type':
+                self.block_cases[block] = row[start + 1].strip()
+
+    def profile_labels(self, block: int) -> List[str]:
+        """Get a block's 'Type', 'Income 1' and 'Income 2' header labels, '' where missing."""
+        start = self.block_starts[block]
+        return [
+            self.profile_rows[label][start].strip()
+            if label in self.profile_rows and start < len(self.profile_rows[label]) else ''
+            for label in PROFILE_HEADER_LABELS
+        ]
+
+    def records(self) -> Iterator[MatrixRecord]:
+        """Yield one long-format record per family block."""
+        if self.values is None:
+            return
+
+        for part, total_column in MATRIX_PART_TOTALS.items():
+            positions = [NUMERIC_POSITIONS[col] for col in MATRIX_PART_COLUMNS[part]]
+            self.values[:, NUMERIC_POSITIONS[total_column]] = np.nansum(self.values[:, positions], axis=1)
+
+        country_code = self.metadata.get('County Code') or self.metadata.get('Country Code', '')
+        country_name = self.metadata.get('Country', '')
+
+        for block in range(len(self.output_columns)):
+            incomecase, familytype, incomegender = derive_block_codes(*self.profile_labels(block))
+            # Blocks with an unknown label are told apart by their position in the matrix
+            alternative = 0 if incomecase and familytype and incomegender else block + 1
+            case = CASE_CODES.get(self.block_cases[block].lower(), 0)
+            dimensions = [
+                country_code,
+                country_name,
+                str(incomecase),
+                str(familytype),
+                str(incomegender),
+                str(case),
+                str(alternative)
+            ]
+            yield dimensions, self.values[block]
+
+def record_key(dimensions: List[str]) -> Tuple[str, ...]:
+    """Get the selection key of a record: its dimensions without the country name."""
+    return (dimensions[0],) + tuple(dimensions[2:])
+
+def iter_matrix_records(lines: Iterable[str]) -> Iterator[MatrixRecord]:
+    """Stream long-format records from Model Family Matrix CSV lines.
+
+    Rows are read one at a time; only the OUTPUT values of the current
+    matrix are held in memory. A workbook may contain several matrices, each
+    starting with a 'Basic Info' row.
+
+    Args:
+        lines: CSV lines, e.g. an open file
+
+    Yields:
+        Tuples of (dimension values laid out as in COLUMN_INDICES, array of
+        NUMERIC_COLUMNS values with NaN for missing cells)
+
+    Raises:
+        ValueError: If two blocks have the same selection key
+    """
+    seen = set()
+
+    def checked(records: Iterator[MatrixRecord]) -> Iterator[MatrixRecord]:
+        for dimensions, values in records:
+            key = record_key(dimensions)
+            if key in seen:
+                raise ValueError(f"Duplicate matrix record key: {'/'.join(key)}")
+            seen.add(key)
+            yield dimensions, values
+
+    matrix = None
+    for row in csv.reader(lines):
+        if row and row[0].strip() == 'Basic Info':
+            if matrix is not None:
+                yield from checked(matrix.records())
+            matrix = MatrixState()
+        elif matrix is not None:
+            matrix.consume(row)
+
+    if matrix is not None:
+        yield from checked(matrix.records())
+
+def iter_matrix_file(path: str) -> Iterator[MatrixRecord]:
+    """Stream long-format records from a Model Family Matrix CSV file."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from iter_matrix_records(f)
@@ -0,0 +1,251 @@
+"""Cached query layer over the welfare dataset."""
+
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+import streamlit as st
+from components.dataset import DIMENSIONS, RESULT_COLUMNS, WelfareDataset
+from components.exchange_rates import ExchangeRateTable, get_rate_table, format_missing_rates_warning
+from components.result_cache import get_result_cache
+from constants import NUMERIC_COLUMNS, RATIO_COLUMNS
+
+# Result columns converted with exchange rates (ratios are not)
+CURRENCY_MASK = np.array([col not in RATIO_COLUMNS for col in RESULT_COLUMNS])
+
+QUERY_CACHE_SIZE = 64
+
+def convert_result_rows(dataset: WelfareDataset, values: np.ndarray, rate_type: Optional[str],
+                        positions: Optional[np.ndarray] = None, rate_table: Optional[ExchangeRateTable] = None,
+                        column_positions: Optional[List[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert result values of dataset rows with the exchange rate of each row's country.
+
+    Currency columns are divided by the rate; ratio columns, rows whose
+    country has no rate of the type, and every row when rate_type is None
+    are left unchanged. Pages, exports, ranks, aggregates and vintage
+    diffs all convert through here.
+
+    Args:
+        dataset: The dataset the rows come from
+        values: (rows x columns) result values of the rows
+        rate_type: Exchange rate type, or None for the original currency
+        positions: Dataset position of every row (default every row of the dataset)
+        rate_table: Rate table to convert with (default the current one)
+        column_positions: RESULT_COLUMNS positions of the value columns (default all)
+
+    Returns:
+        Tuple of (converted values, mask of rows whose country has no rate)
+    """
+    if positions is None:
+        positions = np.arange(len(dataset))
+    if not rate_type:
+        return values, np.zeros(len(positions), dtype=bool)
+    table = get_rate_table() if rate_table is None else rate_table
+    rates = table.rates_for(dataset.categories['country'], rate_type)[dataset.dimension_codes('country')[positions]]
+    missing = np.isnan(rates)
+    currency = CURRENCY_MASK if column_positions is None else CURRENCY_MASK[column_positions]
+    return values / np.where(currency, np.where(missing, 1.0, rates)[:, np.newaxis], 1.0), missing
+
+# Memoized (views, stacked values, missing rates) keyed by normalized query key, least recently used first;
+# shared by every session, so all access goes through the lock
+_results: 'OrderedDict[tuple, Tuple[List[Optional[str]], np.ndarray, Dict[str, List[str]]]]' = OrderedDict()
+_results_lock = threading.Lock()
+
+class WelfareQuery:
+    """Immutable query over a dataset, e.g.
+
+        WelfareQuery(dataset).select(selections).columns('earning').convert('PPP exchange rates').to_frame()
+
+    Rows come either from ordered selections (one result row per selection,
+    zeros where no row matches) or from multi-value predicates evaluated on
+    the bitmap index. Each builder method returns a new query. Results are
+    computed once in the original currency and every rate type together.
+    """
+
+    def __init__(self, dataset: WelfareDataset):
+        self.dataset = dataset
+        self.filters: Dict[str, Tuple[str, ...]] = {}
+        self.selection_keys: Optional[Tuple[Tuple[str, ...], ...]] = None
+        self.projection: Tuple[str, ...] = tuple(NUMERIC_COLUMNS)
+        self.rate_type: Optional[str] = None
+
+    def _copy(self, **changes) -> 'WelfareQuery':
+        query = WelfareQuery(self.dataset)
+        query.__dict__.update(self.__dict__)
+        query.__dict__.update(changes)
+        return query
+
+    def where(self, **filters: Iterable) -> 'WelfareQuery':
+        """Keep rows whose dimensions hold any of the given values."""
+        merged = dict(self.filters)
+        for dimension, values in filters.items():
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension: {dimension}")
+            if isinstance(values, (str, int)):
+                values = [values]
+            merged[dimension] = tuple(sorted(str(value) for value in values))
+        return self._copy(filters=merged)
+
+    def select(self, selections: List[Dict[str, str]]) -> 'WelfareQuery':
+        """Return one row per selection, in order."""
+        keys = tuple(tuple(str(selection[dimension]) for dimension in DIMENSIONS) for selection in selections)
+        return self._copy(selection_keys=keys)
+
+    def columns(self, *columns: str) -> 'WelfareQuery':
+        """Project the result onto numeric or derived columns (default: all numeric columns)."""
+        unknown = [col for col in columns if col not in RESULT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        return self._copy(projection=tuple(columns) if columns else tuple(NUMERIC_COLUMNS))
+
+    def convert(self, rate_type: Optional[str]) -> 'WelfareQuery':
+        """Divide values by each row's exchange rate of the given type (None keeps original currency)."""
+        return self._copy(rate_type=rate_type)
+
+    def key(self) -> tuple:
+        """Get the normalized key identifying the query result in every currency view."""
+        return (
+            self.dataset.version,
+            tuple(sorted((dimension, values) for dimension, values in self.filters.items() if values)),
+            self.selection_keys,
+            self.projection
+        )
+
+    def _selected_keys(self) -> List[Tuple[str, ...]]:
+        filters = [(DIMENSIONS.index(dimension), values) for dimension, values in self.filters.items() if values]
+        return [key for key in self.selection_keys if all(key[i] in values for i, values in filters)]
+
+    def rows(self) -> np.ndarray:
+        """Get the dataset position of every result row, -1 where a selection matches no row."""
+        if self.selection_keys is not None:
+            key_index = self.dataset.key_index
+            return np.array([key_index.get(key, -1) for key in self._selected_keys()], dtype=np.intp)
+        return self.dataset.bitmap_index.rows(self.filters)
+
+    def count(self) -> int:
+        """Count the result rows."""
+        return len(self.rows())
+
+    def _compute(self, positions: np.ndarray, views: List[Optional[str]],
+                 column_positions: Optional[List[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Compute result vectors of rows in every view.
+
+        Args:
+            positions: Dataset position of every row, -1 for selections without a row
+            views: None for the original currency, then rate types
+            column_positions: RESULT_COLUMNS positions to compute (default all)
+
+        Returns:
+            Tuple of (views x rows x columns values, views x rows mask of rows
+            whose country has no rate of the view's type)
+        """
+        found = positions >= 0
+        if column_positions is None:
+            column_positions = list(range(len(RESULT_COLUMNS)))
+
+        # One gather of the projected columns; selections without a row stay 0
+        values = np.zeros((len(views), len(positions), len(column_positions)))
+        missing = np.zeros((len(views), len(positions)), dtype=bool)
+        gathered = self.dataset.result_values[np.ix_(positions[found], column_positions)]
+        for i, rate_type in enumerate(views):
+            values[i, found], missing[i, found] = convert_result_rows(
+                self.dataset, gathered, rate_type, positions[found], column_positions=column_positions
+            )
+        return values, missing
+
+    def _compute_selections(self, positions: np.ndarray, views: List[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Like _compute, but reuse per-selection vectors from the shared result cache.
+
+        Only selections with an uncached view are computed; their vectors are
+        then added to the cache. Cached vectors span every result column, so
+        queries with other projections reuse them.
+        """
+        cache = get_result_cache()
+        selection_keys = self._selected_keys()
+        cache_keys = [(self.dataset.version, key, rate_type) for rate_type in views for key in selection_keys]
+        entries = cache.get_many(cache_keys)
+
+        # Flat (views * selections) layout matching cache_keys
+        stacked = np.empty((len(cache_keys), len(RESULT_COLUMNS)))
+        missing = np.zeros(len(cache_keys), dtype=bool)
+        pending = np.array([i for i, entry in enumerate(entries) if entry is None], dtype=np.intp)
+        hits = np.array([i for i, entry in enumerate(entries) if entry is not None], dtype=np.intp)
+        if len(hits):
+            stacked[hits] = np.array([entries[i][0] for i in hits])
+            missing[hits] = [entries[i][1] for i in hits]
+
+        if len(pending):
+            views_pending, slots_pending = np.divmod(pending, len(selection_keys))
+            rows = np.unique(slots_pending)
+            computed, computed_missing = self._compute(positions[rows], views)
+            row_slots = np.searchsorted(rows, slots_pending)
+            stacked[pending] = computed[views_pending, row_slots]
+            missing[pending] = computed_missing[views_pending, row_slots]
+            cache.put_many(
+                [cache_keys[i] for i in pending],
+                [(stacked[i].copy(), bool(missing[i])) for i in pending]
+            )
+
+        return (stacked.reshape(len(views), len(selection_keys), len(RESULT_COLUMNS)),
+                missing.reshape(len(views), len(selection_keys)))
+
+    def _execute(self) -> Tuple[List[Optional[str]], np.ndarray, Dict[str, List[str]]]:
+        positions = self.rows()
+        views = [None] + get_rate_table().rate_types
+        column_positions = [RESULT_COLUMNS.index(col) for col in self.projection]
+        if self.selection_keys is not None:
+            # Full-width vectors from the shared per-selection cache, projected afterwards
+            stacked, missing = self._compute_selections(positions, views)
+            stacked = stacked[:, :, column_positions]
+        else:
+            # Only the projected columns are gathered and converted
+            stacked, missing = self._compute(positions, views, column_positions)
+
+        country_codes = self.dataset.dimension_codes('country')
+        missing_rates = {
+            rate_type: sorted({self.dataset.decode('country', code) for code in country_codes[positions[missing[i]]]})
+            for i, rate_type in enumerate(views) if rate_type is not None
+        }
+        return views, stacked, missing_rates
+
+    def _result(self) -> Tuple[List[Optional[str]], np.ndarray, Dict[str, List[str]]]:
+        key = self.key()
+        with _results_lock:
+            result = _results.get(key)
+            if result is not None:
+                _results.move_to_end(key)
+                return result
+
+        # Computed outside the lock; a concurrent identical query just stores the same result
+        result = self._execute()
+        with _results_lock:
+            _results[key] = result
+            _results.move_to_end(key)
+            while len(_results) > QUERY_CACHE_SIZE:
+                _results.popitem(last=False)
+        return result
+
+    def to_frame(self) -> pd.DataFrame:
+        """Run the query in the requested currency.
+
+        All currency views are computed together and memoized, so an
+        identical query in another currency reuses the result. One warning
+        names the countries without a rate of the requested type; their rows
+        keep their original values.
+        """
+        views, stacked, missing_rates = self._result()
+        if self.rate_type not in views:
+            raise ValueError(f"Unknown exchange rate type: {self.rate_type}")
+
+        if missing_rates.get(self.rate_type):
+            st.warning(format_missing_rates_warning(missing_rates[self.rate_type], self.rate_type))
+        return pd.DataFrame(stacked[views.index(self.rate_type)], columns=list(self.projection), copy=True)
+
+    def to_views(self) -> Dict[Optional[str], pd.DataFrame]:
+        """Run the query in every currency: None for the original currency, then each rate type."""
+        views, stacked, _ = self._result()
+        return {
+            rate_type: pd.DataFrame(view, columns=list(self.projection), copy=True)
+            for rate_type, view in zip(views, stacked)
+        }
@@ -0,0 +1,117 @@
+"""Cross-country rank and percentile precomputation per household profile."""
+
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import streamlit as st
+from components.dataset import DIMENSIONS, RESULT_COLUMNS, WelfareDataset
+from components.exchange_rates import get_rate_table
+from components.query import convert_result_rows
+
+# Dimensions identifying a household profile; countries are ranked within each profile
+PROFILE_DIMENSIONS = [dimension for dimension in DIMENSIONS if dimension != 'country']
+
+def rank_within_groups(values: np.ndarray, group_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Rank the rows of every group on every column, highest value first.
+
+    Tied values share the best rank; NaN values get rank 0 and are not
+    counted.
+
+    Args:
+        values: (rows x columns) values, NaN where missing
+        group_ids: Group of every row
+
+    Returns:
+        Tuple of (rows x columns) int16 ranks and (rows x columns) int16
+        number of ranked rows in the row's group
+    """
+    rows, columns = values.shape
+    group_column = np.broadcast_to(group_ids[:, np.newaxis], values.shape)
+    # Sort by group, then by descending value with NaN last
+    order = np.lexsort((np.where(np.isnan(values), np.inf, -values), group_column), axis=0)
+    sorted_values = np.take_along_axis(values, order, axis=0)
+    sorted_groups = group_ids[order]
+    present = ~np.isnan(sorted_values)
+
+    # A new tie run starts at every group start and every change of value
+    index = np.broadcast_to(np.arange(rows)[:, np.newaxis], values.shape)
+    group_start = np.ones(values.shape, dtype=bool)
+    group_start[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    run_start = group_start.copy()
+    run_start[1:] |= sorted_values[1:] != sorted_values[:-1]
+    first_of_group = np.maximum.accumulate(np.where(group_start, index, 0), axis=0)
+    first_of_run = np.maximum.accumulate(np.where(run_start, index, 0), axis=0)
+
+    sorted_ranks = np.where(present, first_of_run - first_of_group + 1, 0)
+    group_counts = np.zeros((group_ids.max() + 1 if rows else 0, columns), dtype=np.intp)
+    np.add.at(group_counts, (sorted_groups, np.arange(columns)), present)
+
+    ranks = np.empty(values.shape, dtype=np.int16)
+    np.put_along_axis(ranks, order, sorted_ranks, axis=0)
+    counts = group_counts[group_ids].astype(np.int16)
+    return ranks, counts
+
+def rank_percentiles(ranks: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Share of ranked countries placed below each rank, in percent (100 for a sole country, NaN where unranked)."""
+    counts = counts.astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = np.where(counts > 1, 100.0 * (counts - ranks) / (counts - 1), 100.0)
+    return np.where(ranks > 0, result, np.nan)
+
+class RankTable:
+    """Each row's cross-country rank and percentile within its household profile.
+
+    Ranks are computed on every result column after conversion with each
+    exchange rate type (ratio columns are never converted).
+
+    Attributes:
+        views: None for the original currency, then each rate type
+        ranks: (views x rows x RESULT_COLUMNS) int16 ranks, 1 for the highest value, 0 where missing
+        counts: (views x rows x RESULT_COLUMNS) int16 number of ranked countries
+    """
+
+    def __init__(self, dataset: WelfareDataset):
+        table = get_rate_table()
+        self.views: List[Optional[str]] = [None] + table.rate_types
+
+        _, profile_ids = np.unique(
+            dataset.codes[:, [DIMENSIONS.index(dimension) for dimension in PROFILE_DIMENSIONS]],
+            axis=0, return_inverse=True
+        )
+        profile_ids = profile_ids.ravel()
+        values = np.where(dataset.result_missing, np.nan, dataset.result_values)
+
+        self.ranks = np.zeros((len(self.views), len(dataset), len(RESULT_COLUMNS)), dtype=np.int16)
+        self.counts = np.zeros_like(self.ranks)
+        for i, rate_type in enumerate(self.views):
+            converted, _ = convert_result_rows(dataset, values, rate_type, rate_table=table)
+            self.ranks[i], self.counts[i] = rank_within_groups(converted, profile_ids)
+
+    def percentiles(self, view: int) -> np.ndarray:
+        """Percentile of every row within its household profile (see rank_percentiles)."""
+        return rank_percentiles(self.ranks[view], self.counts[view])
+
+    def lookup(self, positions: np.ndarray,
+               rate_type: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """Get the ranks, ranked-country counts and percentiles of rows, 0 (NaN percentile) for positions of -1.
+
+        Returns:
+            Tuple of (ranks, counts, percentiles) frames with one row per position and RESULT_COLUMNS columns
+        """
+        view = self.views.index(rate_type)
+        found = positions >= 0
+        ranks = np.zeros((len(positions), len(RESULT_COLUMNS)), dtype=np.int16)
+        counts = np.zeros_like(ranks)
+        ranks[found] = self.ranks[view, positions[found]]
+        counts[found] = self.counts[view, positions[found]]
+        return (pd.DataFrame(ranks, columns=RESULT_COLUMNS),
+                pd.DataFrame(counts, columns=RESULT_COLUMNS),
+                pd.DataFrame(rank_percentiles(ranks, counts), columns=RESULT_COLUMNS))
+
+@st.cache_resource(max_entries=4)
+def _cached_rank_table(_dataset: WelfareDataset, version: str) -> RankTable:
+    return RankTable(_dataset)
+
+def get_rank_table(dataset: WelfareDataset) -> RankTable:
+    """Get the rank table of a dataset, computed once per dataset version."""
+    return _cached_rank_table(dataset, dataset.version)
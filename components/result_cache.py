@@ -0,0 +1,70 @@
+"""Shared LRU cache of per-selection result vectors."""
+
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Hashable, Optional, Tuple
+import numpy as np
+import streamlit as st
+from constants import RESULT_CACHE_SETTINGS
+
+# Result vector of one selection in one currency, and whether its country lacked the rate
+ResultEntry = Tuple[np.ndarray, bool]
+
+class SelectionResultCache:
+    """Bounded LRU of result vectors keyed by (dataset version, selection key, rate type).
+
+    The cache is shared by every session, so all access goes through a lock.
+    Hits and misses are counted for monitoring.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[Hashable, ResultEntry]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[Hashable]) -> List[Optional[ResultEntry]]:
+        """Look up entries, None for each key that is not cached."""
+        with self._lock:
+            found = []
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                found.append(entry)
+            hits = sum(entry is not None for entry in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+            return found
+
+    def put_many(self, keys: List[Hashable], entries: List[ResultEntry]) -> None:
+        """Store entries, evicting the least recently used ones beyond the bound."""
+        with self._lock:
+            for key, entry in zip(keys, entries):
+                self.entries[key] = entry
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Get the hit and miss counters and the current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries
+            }
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+@st.cache_resource
+def get_result_cache() -> SelectionResultCache:
+    """Get the result cache shared across sessions."""
+    return SelectionResultCache(RESULT_CACHE_SETTINGS['max_entries'])
@@ -0,0 +1,137 @@
+"""Named selection scenarios over one shared, interned selection table."""
+
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+import numpy as np
+from components.dataset import DIMENSIONS
+from components.ranking import PROFILE_DIMENSIONS
+
+# Ways of pairing the selections of two scenarios in the delta view
+PAIRINGS = ['position', 'profile']
+
+PROFILE_POSITIONS = [DIMENSIONS.index(dimension) for dimension in PROFILE_DIMENSIONS]
+
+class SelectionTable:
+    """Every distinct selection key of a session, stored once.
+
+    Scenarios hold the integer ids of their selections, so a selection that
+    is in several scenarios, or imported again, is not stored twice.
+
+    Attributes:
+        keys: (country, incomecase, familytype, incomegender, case, alternative) key of each id
+        ids: Id of each key
+    """
+
+    def __init__(self):
+        self.keys: List[Tuple[str, ...]] = []
+        self.ids: Dict[Tuple[str, ...], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @staticmethod
+    def normalize(selection: Dict[str, Any]) -> Tuple[str, ...]:
+        """Get the key of a selection, ignoring any other fields."""
+        return tuple(str(selection[dimension]) for dimension in DIMENSIONS)
+
+    def intern(self, selection: Dict[str, Any]) -> int:
+        """Get the id of a selection, adding it to the table if it is new."""
+        key = self.normalize(selection)
+        selection_id = self.ids.get(key)
+        if selection_id is None:
+            selection_id = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+        return selection_id
+
+    def intern_many(self, selections: Iterable[Dict[str, Any]]) -> List[int]:
+        """Get the ids of selections, adding the new ones."""
+        return [self.intern(selection) for selection in selections]
+
+    def selections(self, ids: Iterable[int]) -> List[Dict[str, str]]:
+        """Get the selections of ids, in order."""
+        return [dict(zip(DIMENSIONS, self.keys[selection_id])) for selection_id in ids]
+
+class SelectionStore:
+    """Selections of one scenario, as an insertion-ordered set of selection ids.
+
+    Selections are normalized to their keys and interned in the shared
+    SelectionTable; the ids are kept as the keys of an insertion-ordered
+    dict, so add, remove and contains are O(1) and other fields of a
+    selection dict (such as a display index) never affect membership.
+    Positions are implicit in the order, so deleting rebuilds the order once
+    instead of renumbering every selection.
+    """
+
+    def __init__(self, table: SelectionTable):
+        self.table = table
+        self.ids: Dict[int, None] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids)
+
+    def __contains__(self, selection: Dict[str, Any]) -> bool:
+        selection_id = self.table.ids.get(SelectionTable.normalize(selection))
+        return selection_id is not None and selection_id in self.ids
+
+    def add(self, selection: Dict[str, Any]) -> bool:
+        """Add a selection; returns whether it was new."""
+        return self.add_many([selection]) == 1
+
+    def add_many(self, selections: Iterable[Dict[str, Any]]) -> int:
+        """Add selections in order, skipping those already stored; returns the number added."""
+        count = len(self.ids)
+        self.ids.update(dict.fromkeys(self.table.intern_many(selections)))
+        return len(self.ids) - count
+
+    def remove(self, selection: Dict[str, Any]) -> bool:
+        """Remove a selection; returns whether it was stored."""
+        selection_id = self.table.ids.get(SelectionTable.normalize(selection))
+        return selection_id is not None and self.ids.pop(selection_id, False) is None
+
+    def remove_positions(self, positions: Iterable[int]) -> int:
+        """Remove the selections at positions of the current order; returns the number removed."""
+        dropped = set(positions)
+        count = len(self.ids)
+        self.ids = dict.fromkeys(
+            selection_id for position, selection_id in enumerate(self.ids) if position not in dropped
+        )
+        return count - len(self.ids)
+
+    def clear(self) -> None:
+        """Remove every selection."""
+        self.ids = {}
+
+    def selections(self) -> List[Dict[str, str]]:
+        """Get the selections, in order."""
+        return self.table.selections(self.ids)
+
+def pair_selections(base: List[Dict[str, str]], other: List[Dict[str, str]],
+                    pair_by: str = 'position') -> Tuple[np.ndarray, np.ndarray]:
+    """Pair the selections of two scenarios for the delta view.
+
+    'position' pairs the i-th selections of both scenarios; 'profile' pairs
+    the first selections of both with the same household profile (every
+    dimension but country), in the base scenario's order.
+
+    Returns:
+        Tuple of base positions and other positions of the pairs
+    """
+    if pair_by == 'position':
+        pairs = np.arange(min(len(base), len(other)))
+        return pairs, pairs
+    if pair_by != 'profile':
+        raise ValueError(f"Unknown pairing: {pair_by}")
+
+    def profiles(selections: List[Dict[str, str]]) -> Dict[Tuple[str, ...], int]:
+        keys = [SelectionTable.normalize(selection) for selection in selections]
+        # Insert in reverse so the first selection of a profile wins
+        return {tuple(keys[i][p] for p in PROFILE_POSITIONS): i for i in range(len(keys) - 1, -1, -1)}
+
+    base_profiles = profiles(base)
+    other_profiles = profiles(other)
+    paired = sorted((position, other_profiles[profile]) for profile, position in base_profiles.items()
+                    if profile in other_profiles)
+    return (np.array([pair[0] for pair in paired], dtype=np.intp),
+            np.array([pair[1] for pair in paired], dtype=np.intp))
@@ -0,0 +1,137 @@
+"""Concurrent, revision-aware Google Sheets shard loading for the Global Welfare Dashboard."""
+
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Tuple, Union
+from gspread.exceptions import APIError
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from auth import open_by_url
+from components.snapshot_store import read_snapshot, read_snapshot_metadata, write_snapshot
+from constants import SHEET_SHARDS, SHEET_FETCH_WORKERS, SHEET_REVISION_EDGE_ROWS, SNAPSHOT_SETTINGS
+
+def get_worksheet(spreadsheet, worksheet_ref: Union[int, str]):
+    """Get a worksheet from a spreadsheet by index or title."""
+    if isinstance(worksheet_ref, int):
+        return spreadsheet.get_worksheet(worksheet_ref)
+    return spreadsheet.worksheet(worksheet_ref)
+
+def get_shard_snapshot_name(shard_name: str) -> str:
+    """Get the snapshot name used to store a single shard."""
+    return f"{SNAPSHOT_SETTINGS['sheet_snapshot']}.{shard_name}"
+
+def get_shard_revision(spreadsheet, shard: Dict[str, Any]) -> str:
+    """Get a cheap revision marker for a shard.
+
+    Uses the Drive modified time of the spreadsheet. If Drive metadata is not
+    available (the credentials lack the Drive metadata scope), falls back to
+    a hash of each worksheet's grid size, first column and first and last
+    SHEET_REVISION_EDGE_ROWS used rows, read with two small requests instead
+    of the whole sheet. That fallback does not see edits confined to other
+    cells of interior rows.
+
+    Args:
+        spreadsheet: The opened spreadsheet
+        shard: Shard configuration with 'url' and 'worksheets' keys
+
+    Returns:
+        The revision marker
+    """
+    try:
+        return f"modified:{spreadsheet.lastUpdateTime}"
+    except APIError:
+        digest = hashlib.sha1()
+        for worksheet_ref in shard.get('worksheets', [0]):
+            worksheet = get_worksheet(spreadsheet, worksheet_ref)
+            first_column = worksheet.col_values(1)
+            used = len(first_column)
+            digest.update(f"{worksheet.row_count}x{worksheet.col_count}:{used}".encode())
+            digest.update('\x1f'.join(first_column).encode())
+            if used:
+                edge = min(SHEET_REVISION_EDGE_ROWS, used)
+                for rows in worksheet.batch_get([f"1:{edge}", f"{used - edge + 1}:{used}"]):
+                    for row in rows:
+                        digest.update('\x1f'.join(row).encode())
+                        digest.update(b'\x1e')
+        return f"content:{digest.hexdigest()}"
+
+def fetch_shard(spreadsheet, shard: Dict[str, Any]) -> List[List[str]]:
+    """Fetch all configured worksheets of a shard, skipping each header row.
+
+    Args:
+        spreadsheet: The opened spreadsheet
+        shard: Shard configuration with 'url' and 'worksheets' keys
+
+    Returns:
+        The combined worksheet rows of the shard
+    """
+    rows = []
+    for worksheet_ref in shard.get('worksheets', [0]):
+        rows.extend(get_worksheet(spreadsheet, worksheet_ref).get_all_values()[1:])
+    return rows
+
+def sync_shard(shard_name: str, shard: Dict[str, Any],
+               open_spreadsheet: Callable = open_by_url) -> Tuple[List[List[str]], bool]:
+    """Get a shard's rows, re-downloading only if its revision has changed.
+
+    Args:
+        shard_name: The shard name
+        shard: Shard configuration with 'url' and 'worksheets' keys
+        open_spreadsheet: Function opening a spreadsheet by URL
+
+    Returns:
+        Tuple of (shard rows, whether the shard was re-downloaded)
+    """
+    snapshot_name = get_shard_snapshot_name(shard_name)
+    spreadsheet = open_spreadsheet(shard['url'])
+    revision = get_shard_revision(spreadsheet, shard)
+
+    metadata = read_snapshot_metadata(snapshot_name)
+    if metadata is not None and metadata.get('revision') == revision:
+        snapshot = read_snapshot(snapshot_name)
+        if snapshot is not None:
+            return snapshot[0], False
+
+    rows = fetch_shard(spreadsheet, shard)
+    try:
+        write_snapshot(snapshot_name, rows, {'revision': revision})
+    except OSError:
+        # The shard snapshot only saves future downloads; the rows are still valid
+        pass
+    return rows, True
+
+def sync_all_shards(shards: Dict[str, Dict[str, Any]] = None,
+                    max_workers: int = SHEET_FETCH_WORKERS,
+                    open_spreadsheet: Callable = open_by_url) -> Tuple[List[List[str]], List[str]]:
+    """Sync all shards concurrently and splice them in configuration order.
+
+    Args:
+        shards: Mapping of shard name to shard configuration
+        max_workers: Upper bound on concurrent fetches
+        open_spreadsheet: Function opening a spreadsheet by URL
+
+    Returns:
+        Tuple of (combined rows of all shards, names of re-downloaded shards)
+    """
+    if shards is None:
+        shards = SHEET_SHARDS
+    if not shards:
+        return [], []
+
+    # Propagate the Streamlit script context so worker threads can report errors
+    script_ctx = get_script_run_ctx()
+
+    def attach_script_ctx():
+        add_script_run_ctx(threading.current_thread(), script_ctx)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(shards)),
+                            initializer=attach_script_ctx) as executor:
+        futures = {
+            name: executor.submit(sync_shard, name, shard, open_spreadsheet)
+            for name, shard in shards.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
+
+    combined_rows = [row for rows, _ in results.values() for row in rows]
+    changed_shards = [name for name, (_, changed) in results.items() if changed]
+    return combined_rows, changed_shards
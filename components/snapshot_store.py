@@ -0,0 +1,109 @@
+"""Local columnar snapshot store for the Global Welfare Dashboard."""
+
+import os
+import tempfile
+import time
+from typing import Callable, List, Dict, Optional, Tuple
+import pyarrow as pa
+import pyarrow.parquet as pq
+from constants import SNAPSHOT_SETTINGS
+
+def get_snapshot_path(name: str) -> str:
+    """Get the Parquet file path for a named snapshot."""
+    return os.path.join(SNAPSHOT_SETTINGS['cache_dir'], f"{name}.parquet")
+
+def write_atomically(path: str, write: Callable[[str], None]) -> None:
+    """Write a file through a uniquely named temporary file in its directory, then swap it in.
+
+    Every writer gets its own temporary file, so concurrent writers never
+    share one and readers only ever see a complete file.
+
+    Args:
+        path: The target file path
+        write: Function writing the file contents to the path it is given
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_snapshot(name: str, rows: List[List[str]], metadata: Dict[str, str] = None) -> None:
+    """Write worksheet rows to a Parquet snapshot.
+
+    Rows are stored as string columns padded to the widest row. The file is
+    written through write_atomically, so readers never see a partial
+    snapshot.
+
+    Args:
+        name: The snapshot name
+        rows: The worksheet rows to store
+        metadata: Optional extra string metadata, e.g. a revision marker
+    """
+    width = max((len(row) for row in rows), default=0)
+    columns = {
+        f"c{i}": pa.array([row[i] if i < len(row) else '' for row in rows], type=pa.string())
+        for i in range(width)
+    }
+    schema_metadata = dict(metadata or {})
+    schema_metadata['fetched_at'] = str(time.time())
+    table = pa.table(columns).replace_schema_metadata(schema_metadata)
+
+    write_atomically(get_snapshot_path(name), lambda path: pq.write_table(table, path))
+
+def read_snapshot(name: str) -> Optional[Tuple[List[List[str]], float]]:
+    """Read worksheet rows from a Parquet snapshot.
+
+    Args:
+        name: The snapshot name
+
+    Returns:
+        Tuple of (rows, fetched_at timestamp), or None if the snapshot is
+        missing or unreadable
+    """
+    path = get_snapshot_path(name)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        table = pq.read_table(path)
+    except (OSError, pa.ArrowException):
+        return None
+
+    metadata = table.schema.metadata or {}
+    fetched_at = float(metadata.get(b'fetched_at', 0))
+    columns = [column.to_pylist() for column in table.columns]
+    rows = [list(row) for row in zip(*columns)]
+    return rows, fetched_at
+
+def read_snapshot_metadata(name: str) -> Optional[Dict[str, str]]:
+    """Read only the metadata of a snapshot, without loading its rows.
+
+    Args:
+        name: The snapshot name
+
+    Returns:
+        The snapshot metadata, or None if the snapshot is missing or unreadable
+    """
+    path = get_snapshot_path(name)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+    except (OSError, pa.ArrowException):
+        return None
+
+    return {key.decode(): value.decode() for key, value in metadata.items()}
+
+def is_snapshot_fresh(fetched_at: float, ttl_seconds: int = None) -> bool:
+    """Check whether a snapshot is younger than the configured TTL."""
+    if ttl_seconds is None:
+        ttl_seconds = SNAPSHOT_SETTINGS['ttl_seconds']
+    return time.time() - fetched_at < ttl_seconds
@@ -2,7 +2,16 @@
 
 import streamlit as st
 from typing import List, Dict, Any, Optional, Tuple
-from components.data_handler import filter_data_by_selection
+from components.dataset import RESULT_COLUMNS, WelfareDataset
+from components.adjustments import describe_adjustment, get_adjusted_dataset
+from components.aggregation import get_aggregates
+from components.exchange_rates import get_rate_table
+from components.query import WelfareQuery
+from components.ranking import get_rank_table
+from components.result_cache import get_result_cache
+from components.scenarios import pair_selections
+from components.vintages import describe_vintage, get_vintage_diff, load_vintage
+import numpy as np
 import pandas as pd
 from constants import (
     SELECTION_LABELS,
@@ -10,17 +19,38 @@ from constants import (
     MESSAGES,
     LAYOUT,
     COUNTRY_NAME,
+    COUNTRY_CODE,
     INCOME_CASE,
     FAMILY_CASES,
     INCOME_GENDER,
     CASES,
-    COLUMN_INDICES,
     COLUMN_NAME_MAPPING,
     EXCLUDED_DISPLAY_COLUMNS,
     CLASS_A_BENEFITS,
-    CLASS_B_COSTS
+    CLASS_B_COSTS,
+    DERIVED_COLUMNS,
+    NUMERIC_COLUMNS
 )
 
+# Display sign of each column: +1 shows as positive (benefits), -1 as negative (costs), 0 as is
+DISPLAY_SIGNS = {
+    **{col: 1 for col in CLASS_A_BENEFITS},
+    **{col: -1 for col in CLASS_B_COSTS}
+}
+
+# Readable column names mapped back to column codes
+COLUMN_CODES = {name: code for code, name in COLUMN_NAME_MAPPING.items()}
+
+# Display format of each dimension's values (country codes, integer codes otherwise)
+DIMENSION_FORMATTERS = {
+    'country': lambda x: COUNTRY_NAME[x],
+    'incomecase': lambda x: f"{x}: {INCOME_CASE[x]}",
+    'familytype': lambda x: f"{x}: {FAMILY_CASES[x]}",
+    'incomegender': lambda x: f"{x}: {INCOME_GENDER[x]}",
+    'case': lambda x: f"{x}: {CASES[x]}",
+    'alternative': str
+}
+
 def create_selectbox(label: str, options: list, format_func=None) -> str:
     """Create a selectbox with the given label and options in the sidebar.
     
@@ -36,59 +66,56 @@ def create_selectbox(label: str, options: list, format_func=None) -> str:
         return st.sidebar.selectbox(label, options)
     return st.sidebar.selectbox(label, options, format_func=format_func)
 
-def get_filtered_data(worksheet: List[List[str]], country_code: str) -> Dict[str, List[int]]:
+def get_filtered_data(dataset: WelfareDataset, country_code: str) -> Dict[str, List[int]]:
     """Get filtered data for a specific country.
     
     Args:
-        worksheet: The worksheet data
+        dataset: The typed dataset
         country_code: The country code to filter by
         
     Returns:
         Dictionary containing filtered data for each category
     """
-    country_data = [row for row in worksheet if row[COLUMN_INDICES['country']] == country_code]
+    country_mask = dataset.dimension_codes('country') == dataset.encode('country', country_code)
     
     return {
-        'incomecase': sorted(list(set(int(row[COLUMN_INDICES['incomecase']]) 
-                                    for row in country_data if row[COLUMN_INDICES['incomecase']]))),
-        'familytype': sorted(list(set(int(row[COLUMN_INDICES['familytype']]) 
-                                    for row in country_data if row[COLUMN_INDICES['familytype']]))),
-        'incomegender': sorted(list(set(int(row[COLUMN_INDICES['incomegender']]) 
-                                      for row in country_data if row[COLUMN_INDICES['incomegender']]))),
-        'case': sorted(list(set(int(row[COLUMN_INDICES['case']]) 
-                              for row in country_data if row[COLUMN_INDICES['case']]))),
-        'alternative': sorted(list(set(int(row[COLUMN_INDICES['alternative']]) 
-                                     for row in country_data if row[COLUMN_INDICES['alternative']])))
+        'incomecase': [int(value) for value in dataset.options('incomecase', country_mask)],
+        'familytype': [int(value) for value in dataset.options('familytype', country_mask)],
+        'incomegender': [int(value) for value in dataset.options('incomegender', country_mask)],
+        'case': [int(value) for value in dataset.options('case', country_mask)],
+        'alternative': [int(value) for value in dataset.options('alternative', country_mask)]
     }
 
-def filter_data_by_selection_criteria(worksheet: List[List[str]], 
+def filter_data_by_selection_criteria(dataset: WelfareDataset, 
                                     country_code: str,
-                                    selection_criteria: Dict[str, int]) -> List[List[str]]:
-    """Filter worksheet data based on selection criteria.
+                                    selection_criteria: Dict[str, int]) -> np.ndarray:
+    """Filter dataset rows based on selection criteria.
     
     Args:
-        worksheet: The worksheet data
+        dataset: The typed dataset
         country_code: The country code
         selection_criteria: Dictionary of selection criteria and their values
         
     Returns:
-        Filtered worksheet data
+        Positions of the matching rows
     """
-    filtered_data = [row for row in worksheet if row[COLUMN_INDICES['country']] == country_code]
-    
-    for field, value in selection_criteria.items():
-        filtered_data = [row for row in filtered_data 
-                        if int(row[COLUMN_INDICES[field]]) == value]
-    
-    return filtered_data
+    return WelfareQuery(dataset).where(country=country_code, **selection_criteria).rows()
 
-def create_selection_fields(data: dict, worksheet: list, import_mode: bool = False) -> dict:
+def get_facet_options(nodes: list) -> List[int]:
+    """Get the sorted union of the options offered by facet tree nodes."""
+    return sorted(set(int(value) for node in nodes for value in node))
+
+def descend_facet_nodes(nodes: list, value) -> list:
+    """Get the child nodes reached by choosing a value in each facet tree node."""
+    key = str(value)
+    return [node[key] for node in nodes if key in node]
+
+def create_selection_fields(data: dict, dataset: WelfareDataset, import_mode: bool = False) -> dict:
     """Create selection fields for data analysis with strict cascading filtering."""
-    # Start with all worksheet data
-    filtered_rows = worksheet
+    facet_tree = dataset.facet_tree
 
     # Country selection (multi-select)
-    country_options = sorted(set(row[COLUMN_INDICES['country']] for row in filtered_rows if row[COLUMN_INDICES['country']]))
+    country_options = list(facet_tree)
     selected_country_names = st.sidebar.multiselect(
         SELECTION_LABELS['country'],
         [COUNTRY_NAME[code] for code in country_options],
@@ -99,8 +126,7 @@ def create_selection_fields(data: dict, worksheet: list, import_mode: bool = Fal
     if not selected_country_names:
         selected_country_codes = country_options
     else:
-        selected_country_codes = [code for code, name in COUNTRY_NAME.items() if name in selected_country_names]
-    filtered_rows = [row for row in filtered_rows if row[COLUMN_INDICES['country']] in selected_country_codes]
+        selected_country_codes = sorted(COUNTRY_CODE[name] for name in selected_country_names)
     
     # In import mode, show information about selected countries and return early
     if import_mode:
@@ -108,16 +134,8 @@ def create_selection_fields(data: dict, worksheet: list, import_mode: bool = Fal
                        "\n".join([f"• {COUNTRY_NAME[code]}" for code in selected_country_codes]))
         
         # Count total combinations for selected countries
-        total_combinations = 0
-        for country in selected_country_codes:
-            country_data = [row for row in worksheet if row[COLUMN_INDICES['country']] == country]
-            if country_data:
-                unique_combos = set()
-                for row in country_data:
-                    if len(row) > 6:
-                        combo = (row[2], row[3], row[4], row[5], row[6])
-                        unique_combos.add(combo)
-                total_combinations += len(unique_combos)
+        catalog = dataset.combination_catalog
+        total_combinations = sum(len(catalog.get(country, [])) for country in selected_country_codes)
         
         st.sidebar.info(f"**{total_combinations}** total case combinations will be imported")
         
@@ -141,44 +159,47 @@ def create_selection_fields(data: dict, worksheet: list, import_mode: bool = Fal
                 'alternative': ''
             }
 
+    # Each selectbox offers the options under the facet tree nodes of the choices made so far
+    nodes = [facet_tree[code] for code in selected_country_codes if code in facet_tree]
+
     # Income case selection
-    incomecase_options = sorted(set(int(row[COLUMN_INDICES['incomecase']]) for row in filtered_rows if row[COLUMN_INDICES['incomecase']]))
+    incomecase_options = get_facet_options(nodes)
     selected_incomecase_idx = create_selectbox(
         SELECTION_LABELS['incomecase'],
         incomecase_options,
         format_func=lambda x: f"{x}: {INCOME_CASE[x]}"
     )
-    filtered_rows = [row for row in filtered_rows if int(row[COLUMN_INDICES['incomecase']]) == selected_incomecase_idx]
+    nodes = descend_facet_nodes(nodes, selected_incomecase_idx)
 
     # Family type selection
-    familytype_options = sorted(set(int(row[COLUMN_INDICES['familytype']]) for row in filtered_rows if row[COLUMN_INDICES['familytype']]))
+    familytype_options = get_facet_options(nodes)
     selected_familytype_idx = create_selectbox(
         SELECTION_LABELS['familytype'],
         familytype_options,
         format_func=lambda x: f"{x}: {FAMILY_CASES[x]}"
     )
-    filtered_rows = [row for row in filtered_rows if int(row[COLUMN_INDICES['familytype']]) == selected_familytype_idx]
+    nodes = descend_facet_nodes(nodes, selected_familytype_idx)
 
     # Income gender selection
-    incomegender_options = sorted(set(int(row[COLUMN_INDICES['incomegender']]) for row in filtered_rows if row[COLUMN_INDICES['incomegender']]))
+    incomegender_options = get_facet_options(nodes)
     selected_incomegender_idx = create_selectbox(
         SELECTION_LABELS['incomegender'],
         incomegender_options,
         format_func=lambda x: f"{x}: {INCOME_GENDER[x]}"
     )
-    filtered_rows = [row for row in filtered_rows if int(row[COLUMN_INDICES['incomegender']]) == selected_incomegender_idx]
+    nodes = descend_facet_nodes(nodes, selected_incomegender_idx)
 
     # Case selection
-    case_options = sorted(set(int(row[COLUMN_INDICES['case']]) for row in filtered_rows if row[COLUMN_INDICES['case']]))
+    case_options = get_facet_options(nodes)
     selected_case_idx = create_selectbox(
         SELECTION_LABELS['case'],
         case_options,
         format_func=lambda x: f"{x}: {CASES[x]}"
     )
-    filtered_rows = [row for row in filtered_rows if int(row[COLUMN_INDICES['case']]) == selected_case_idx]
+    nodes = descend_facet_nodes(nodes, selected_case_idx)
 
     # Alternative selection
-    alternative_options = sorted(set(int(row[COLUMN_INDICES['alternative']]) for row in filtered_rows if row[COLUMN_INDICES['alternative']]))
+    alternative_options = get_facet_options(nodes)
     selected_alternative = create_selectbox(
         SELECTION_LABELS['alternative'],
         alternative_options
@@ -207,6 +228,36 @@ def create_selection_fields(data: dict, worksheet: list, import_mode: bool = Fal
             'multiple_countries': True
         }
 
+def create_filter_fields(dataset: WelfareDataset) -> Dict[str, List[str]]:
+    """Create multi-select filters on every dimension, backed by the bitmap index.
+
+    Each field offers the values left by the filters above it; an empty
+    field matches any value.
+
+    Returns:
+        Dictionary mapping each dimension to its selected values
+    """
+    index = dataset.bitmap_index
+
+    filters = {}
+    for dimension, format_func in DIMENSION_FORMATTERS.items():
+        options = index.options(dimension, filters)
+        if dimension != 'country':
+            options = [int(value) for value in options]
+        selected = st.sidebar.multiselect(
+            SELECTION_LABELS[dimension],
+            options,
+            default=[],
+            format_func=format_func,
+            key=f"filter_{dimension}"
+        )
+        filters[dimension] = [str(value) for value in selected]
+
+    total_combinations = len(index.combinations(filters))
+    st.sidebar.info(f"**{total_combinations}** matching case combinations")
+
+    return filters
+
 def display_selections(selections: list, scenario_num: int) -> None:
     """Display cached selections in an interactive data editor."""
     if not selections:
@@ -315,46 +366,176 @@ def display_selections(selections: list, scenario_num: int) -> None:
         if rows_to_delete:
             st.info(f"💡 **{len(rows_to_delete)} selection(s) marked for deletion** - Use the 'Delete' button in the sidebar to remove them")
 
-def display_final_results(selections, worksheet, exchange_rate_type: str = None, selected_columns: list = None) -> None:
+def shape_display_frame(df: pd.DataFrame, selection_labels: List[str],
+                        selected_columns: Optional[List[str]] = None, apply_signs: bool = True) -> pd.DataFrame:
+    """Shape result rows into the display table: one row per category, one column per selection.
+
+    Excluded columns are dropped, the table is projected onto the selected
+    columns (if any of them are present; derived columns are only shown when
+    selected), benefits are shown as positive and costs as negative values,
+    and categories get their readable names.
+
+    Args:
+        df: Result frame with one row per selection and a column per category
+        selection_labels: Display label of each selection
+        selected_columns: Readable names of the columns to show, or None for all
+        apply_signs: Whether to show benefits as positive and costs as negative values
+
+    Returns:
+        The display table
+    """
+    codes = [col for col in df.columns if col not in EXCLUDED_DISPLAY_COLUMNS]
+
+    if selected_columns:
+        available_codes = [code for code in (COLUMN_CODES.get(col, col) for col in selected_columns) if code in codes]
+        if available_codes:
+            codes = available_codes
+        else:
+            codes = [code for code in codes if code not in DERIVED_COLUMNS]
+    else:
+        codes = [code for code in codes if code not in DERIVED_COLUMNS]
+
+    values = df.to_numpy()[:, df.columns.get_indexer(codes)].T
+    if apply_signs:
+        signs = np.array([DISPLAY_SIGNS.get(code, 0) for code in codes])[:, np.newaxis]
+        values = np.where(signs == 0, values, signs * np.abs(values))
+
+    return pd.DataFrame(
+        values,
+        index=[COLUMN_NAME_MAPPING.get(code, code) for code in codes],
+        columns=selection_labels
+    )
+
+def display_stacked_bar_chart(chart_df_display: pd.DataFrame, x_title: str = "Selections") -> None:
+    """Plot a display table (one row per category, one column per bar) as a relative stacked bar chart.
+
+    Derived columns are totals or ratios, so they are left out of the stack.
+    """
+    chart_df_display = chart_df_display.drop(
+        index=[COLUMN_NAME_MAPPING.get(col, col) for col in DERIVED_COLUMNS], errors='ignore'
+    )
+    if chart_df_display.empty:
+        st.info("Derived metrics are shown in the table only; select other categories to chart them.")
+        return
+
+    # Use the transposed data directly for plotting
+    import plotly.graph_objects as go
+
+    # Reset index to make categories a column
+    chart_df_plot = chart_df_display.reset_index()
+
+    # Get selection columns (exclude 'index' column)
+    selection_cols = [col for col in chart_df_plot.columns if col != 'index']
+
+    # Create the stacked bar chart
+    fig = go.Figure()
+
+    # Define distinct colors using a scientifically-designed palette
+    # Colors chosen to maximize perceptual difference and avoid duplicates
+    distinct_colors = [
+        '#FF1744',  # 1. Vivid Red
+        '#2979FF',  # 2. Vivid Blue
+        '#00E676',  # 3. Vivid Green
+        '#FF9100',  # 4. Vivid Orange
+        '#D500F9',  # 5. Vivid Purple
+        '#00E5FF',  # 6. Vivid Cyan
+        '#FFEA00',  # 7. Vivid Yellow
+        '#FF4081',  # 8. Vivid Pink
+        '#00BFA5',  # 9. Vivid Teal
+        '#6200EA',  # 10. Deep Purple
+        '#76FF03',  # 11. Lime
+        '#FF6E40',  # 12. Deep Orange
+        '#304FFE',  # 13. Indigo
+        '#AEEA00',  # 14. Light Lime
+        '#DD2C00',  # 15. Dark Red
+        '#0091EA',  # 16. Light Blue
+        '#64DD17',  # 17. Light Green
+        '#AA00FF',  # 18. Deep Purple Accent
+        '#FFD600',  # 19. Gold
+        '#FF3D00',  # 20. Red Orange
+        '#1DE9B6',  # 21. Aqua
+        '#651FFF',  # 22. Purple
+        '#C6FF00',  # 23. Yellow Green
+        '#F50057',  # 24. Magenta
+        '#00B8D4',  # 25. Dark Cyan
+        '#FFAB00',  # 26. Amber
+        '#448AFF',  # 27. Sky Blue
+        '#69F0AE',  # 28. Mint
+        '#E040FB',  # 29. Orchid
+        '#FFC400',  # 30. Bright Amber
+        '#18FFFF',  # 31. Electric Cyan
+    ]
+
+    # Add traces for each category (signs already applied above)
+    for idx, row in chart_df_plot.iterrows():
+        category = row['index']
+        values = [row[col] for col in selection_cols]
+
+        fig.add_trace(go.Bar(
+            name=category,
+            x=selection_cols,
+            y=values,
+            text=[f"{v:.0f}" if v != 0 else "" for v in values],
+            textposition='inside',
+            marker_color=distinct_colors[idx % len(distinct_colors)],
+        ))
+
+    fig.update_layout(
+        barmode='relative',  # Changed from 'stack' to 'relative' for proper positive/negative handling
+        title="Stacked Bar Chart",
+        xaxis_title=x_title,
+        yaxis_title="Amount",
+        yaxis=dict(dtick=200),
+        height=600,
+        showlegend=True,
+        hovermode='x unified'
+    )
+
+    import hashlib
+    chart_key = hashlib.md5(str(chart_df_plot.values.tolist()).encode()).hexdigest()[:8]
+    st.plotly_chart(fig, use_container_width=True, key=f"stacked_bar_{chart_key}")
+
+def add_rank_columns(table: pd.DataFrame, ranks: pd.DataFrame, counts: pd.DataFrame,
+                     percentiles: pd.DataFrame) -> pd.DataFrame:
+    """Interleave a "rank" column ("rank/countries") and a "percentile" column after each selection column."""
+    rank_text = ranks.astype(int).astype(str) + "/" + counts.astype(int).astype(str)
+    rank_text = rank_text.where(ranks > 0, "")
+    columns = {}
+    for label in table.columns:
+        columns[label] = table[label]
+        columns[f"{label} rank"] = rank_text[label]
+        columns[f"{label} percentile"] = percentiles[label].round(1)
+    return pd.DataFrame(columns, index=table.index)
+
+def get_selection_labels(selections: list) -> List[str]:
+    """Label selections with their country name and counter (e.g., "Japan-1", "Japan-2")."""
+    country_counters = {}
+    selection_labels = []
+    for sel in selections:
+        country_code = sel.get('country') or sel.get('countries', [None])[0]
+        if country_code:
+            country_name = COUNTRY_NAME.get(country_code, country_code)
+            country_counters[country_code] = country_counters.get(country_code, 0) + 1
+            selection_labels.append(f"{country_name}-{country_counters[country_code]}")
+        else:
+            selection_labels.append(f"Selection {len(selection_labels)+1}")
+    return selection_labels
+
+def display_final_results(selections, dataset, exchange_rate_type: str = None, selected_columns: list = None,
+                          show_ranks: bool = False, adjustments: list = None) -> None:
     if not selections:
         st.warning(MESSAGES['no_data'])
         return
 
-    # Helper function to process dataframe with filters and transformations
-    def process_dataframe(df, sel_labels, sel_cols):
-        df_display = df.T
-        df_display.columns = sel_labels
-
-        # Filter out excluded columns
-        df_display = df_display.drop(index=EXCLUDED_DISPLAY_COLUMNS, errors='ignore')
-
-        # Filter by selected columns if provided
-        if sel_cols:
-            column_code_map = {v: k for k, v in COLUMN_NAME_MAPPING.items()}
-            selected_codes = [column_code_map.get(col, col) for col in sel_cols]
-            available_codes = [code for code in selected_codes if code in df_display.index]
-            if available_codes:
-                df_display = df_display.loc[available_codes]
-
-        # Apply proper signs based on category classification
-        for category in df_display.index:
-            if category in CLASS_A_BENEFITS:
-                df_display.loc[category] = df_display.loc[category].abs()
-            elif category in CLASS_B_COSTS:
-                df_display.loc[category] = -df_display.loc[category].abs()
-
-        # Map column names to readable names
-        df_display.index = df_display.index.map(lambda x: COLUMN_NAME_MAPPING.get(x, x))
-        return df_display
-
     try:
-        from pages.Data_Analytic import prepare_chart_data
+        # Raw, PPP and nominal views come from one memoized computation
+        query = WelfareQuery(dataset).select(selections).columns(*RESULT_COLUMNS)
 
         # Prepare exchange rate adjusted data (if applicable)
-        chart_df = prepare_chart_data(selections, worksheet, exchange_rate_type)
+        chart_df = query.convert(exchange_rate_type).to_frame()
 
         # Always prepare raw data (without exchange rate conversion)
-        chart_df_raw = prepare_chart_data(selections, worksheet, None)
+        chart_df_raw = query.to_frame()
     except Exception as e:
         st.error(f"Error preparing chart data: {e}")
         return
@@ -363,22 +544,16 @@ def display_final_results(selections, worksheet, exchange_rate_type: str = None,
         st.info(f"Values converted using exchange rate: **{exchange_rate_type}**")
     else:
         st.info("Values shown in original currency (no exchange rate conversion applied)")
+    st.caption(MESSAGES['result_cache_stats'].format(**get_result_cache().stats()))
 
-    # Create labels with country name and counter (e.g., "Japan-1", "Japan-2")
-    country_counters = {}
-    selection_labels = []
-    for sel in selections:
-        country_code = sel.get('country') or sel.get('countries', [None])[0]
-        if country_code:
-            country_name = COUNTRY_NAME.get(country_code, country_code)
-            country_counters[country_code] = country_counters.get(country_code, 0) + 1
-            selection_labels.append(f"{country_name}-{country_counters[country_code]}")
-        else:
-            selection_labels.append(f"Selection {len(selection_labels)+1}")
+    selection_labels = get_selection_labels(selections)
 
     # Process both dataframes with the same transformations
-    chart_df_display = process_dataframe(chart_df, selection_labels, selected_columns)
-    chart_df_raw_display = process_dataframe(chart_df_raw, selection_labels, selected_columns)
+    chart_df_display = shape_display_frame(chart_df, selection_labels, selected_columns)
+    chart_df_raw_display = shape_display_frame(chart_df_raw, selection_labels, selected_columns)
+
+    # Display the data table
+    st.subheader("Data Table")
 
     # Add download buttons for both versions
     col1, col2 = st.columns(2)
@@ -413,75 +588,211 @@ def display_final_results(selections, worksheet, exchange_rate_type: str = None,
             use_container_width=True
         )
 
-    st.dataframe(chart_df_display)
+    if show_ranks:
+        # Precomputed once per dataset version; ranks are among countries with the same household profile
+        ranks, counts, percentiles = get_rank_table(dataset).lookup(query.rows(), exchange_rate_type)
+        st.dataframe(
+            add_rank_columns(
+                chart_df_display,
+                shape_display_frame(ranks, selection_labels, selected_columns, apply_signs=False),
+                shape_display_frame(counts, selection_labels, selected_columns, apply_signs=False),
+                shape_display_frame(percentiles, selection_labels, selected_columns, apply_signs=False)
+            ),
+            use_container_width=True
+        )
+    else:
+        st.dataframe(chart_df_display, use_container_width=True)
+
+    # Side-by-side values of every currency view
+    with st.expander("Compare Currencies"):
+        views = query.to_views()
+        comparison = pd.concat(
+            [shape_display_frame(view_df, selection_labels, selected_columns) for view_df in views.values()],
+            axis=1,
+            keys=[rate_type or "Original Currency" for rate_type in views]
+        )
+        comparison = comparison.swaplevel(axis=1).reindex(columns=selection_labels, level=0)
+        st.dataframe(comparison, use_container_width=True)
+
+    if adjustments:
+        # The same selections in the cached adjusted dataset
+        adjusted_query = WelfareQuery(get_adjusted_dataset(dataset, adjustments)).select(selections).columns(*RESULT_COLUMNS)
+        adjusted_display = shape_display_frame(adjusted_query.to_views()[exchange_rate_type], selection_labels, selected_columns)
+
+        st.subheader("What-If Comparison")
+        st.info("Adjustments: " + "; ".join(describe_adjustment(adjustment) for adjustment in adjustments))
+        comparison = pd.concat([chart_df_display, adjusted_display, adjusted_display - chart_df_display],
+                               axis=1, keys=["Baseline", "Adjusted", "Change"])
+        comparison = comparison.swaplevel(axis=1).reindex(columns=selection_labels, level=0)
+        st.download_button(
+            label="📥 Download What-If Comparison as CSV",
+            data=comparison.to_csv(),
+            file_name="welfare_whatif_comparison.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+        st.dataframe(comparison, use_container_width=True)
+
+        # Baseline and adjusted bars of each selection side by side
+        paired = pd.concat([chart_df_display, adjusted_display], axis=1, keys=["Baseline", "Adjusted"])
+        paired = paired.swaplevel(axis=1).reindex(columns=selection_labels, level=0)
+        paired.columns = [f"{label} ({view})" for label, view in paired.columns]
+        st.subheader("Stacked Bar Chart")
+        display_stacked_bar_chart(paired)
+        return
 
-    # Create melted dataframe for plotly (already has correct signs from above)
-    chart_df_melted = chart_df_display.reset_index().melt(
-        id_vars=['index'],
-        var_name='Selection',
-        value_name='Value'
+    # Chart visualization
+    st.subheader("Stacked Bar Chart")
+    display_stacked_bar_chart(chart_df_display)
+
+def display_aggregate_results(selections, dataset: WelfareDataset, group_by: List[str], statistic: str,
+                              exchange_rate_type: str = None, selected_columns: list = None) -> None:
+    """Display a statistic of the cached selections' cases, grouped by dimensions."""
+    if not selections:
+        st.warning(MESSAGES['no_data'])
+        return
+
+    positions = WelfareQuery(dataset).select(selections).rows()
+    positions = np.unique(positions[positions >= 0])
+    try:
+        aggregates = get_aggregates(dataset, group_by, [statistic], positions, exchange_rate_type)[statistic]
+    except ValueError as e:
+        st.error(f"Error aggregating data: {e}")
+        return
+
+    st.info(f"**{statistic}** of {len(positions)} cases per group"
+            + (f", converted using exchange rate: **{exchange_rate_type}**" if exchange_rate_type else ""))
+
+    # One label per group, e.g. "Japan | 1: Single below 60"
+    if group_by:
+        group_labels = [
+            " | ".join(DIMENSION_FORMATTERS[dimension](value if dimension in ('country', 'alternative') else int(value))
+                       for dimension, value in zip(group_by, key))
+            for key in aggregates.index
+        ]
+    else:
+        group_labels = ["All selections"] * len(aggregates)
+
+    aggregate_display = shape_display_frame(aggregates.fillna(0), group_labels, selected_columns)
+
+    st.subheader("Aggregate Table")
+    st.download_button(
+        label="📥 Download Aggregates as CSV",
+        data=aggregate_display.to_csv(),
+        file_name=f"welfare_aggregates_{statistic}.csv",
+        mime="text/csv",
+        use_container_width=True
     )
-    chart_df_melted = chart_df_melted.rename(columns={'index': 'Category'})
+    st.dataframe(aggregate_display, use_container_width=True)
 
-    import plotly.express as px
+    st.subheader("Stacked Bar Chart")
+    display_stacked_bar_chart(aggregate_display, x_title="Groups")
 
-    # Define distinct colors using a scientifically-designed palette
-    # Colors chosen to maximize perceptual difference and avoid duplicates
-    distinct_colors = [
-        '#FF1744',  # 1. Vivid Red
-        '#2979FF',  # 2. Vivid Blue
-        '#00E676',  # 3. Vivid Green
-        '#FF9100',  # 4. Vivid Orange
-        '#D500F9',  # 5. Vivid Purple
-        '#00E5FF',  # 6. Vivid Cyan
-        '#FFEA00',  # 7. Vivid Yellow
-        '#FF4081',  # 8. Vivid Pink
-        '#00BFA5',  # 9. Vivid Teal
-        '#6200EA',  # 10. Deep Purple
-        '#76FF03',  # 11. Lime
-        '#FF6E40',  # 12. Deep Orange
-        '#304FFE',  # 13. Indigo
-        '#AEEA00',  # 14. Light Lime
-        '#DD2C00',  # 15. Dark Red
-        '#0091EA',  # 16. Light Blue
-        '#64DD17',  # 17. Light Green
-        '#AA00FF',  # 18. Deep Purple Accent
-        '#FFD600',  # 19. Gold
-        '#FF3D00',  # 20. Red Orange
-        '#1DE9B6',  # 21. Aqua
-        '#651FFF',  # 22. Purple
-        '#C6FF00',  # 23. Yellow Green
-        '#F50057',  # 24. Magenta
-        '#00B8D4',  # 25. Dark Cyan
-        '#FFAB00',  # 26. Amber
-        '#448AFF',  # 27. Sky Blue
-        '#69F0AE',  # 28. Mint
-        '#E040FB',  # 29. Orchid
-        '#FFC400',  # 30. Bright Amber
-        '#18FFFF',  # 31. Electric Cyan
-    ]
+def display_vintage_comparison(selections, dataset: WelfareDataset, previous_vintage: Dict[str, Any],
+                               exchange_rate_type: str = None, selected_columns: list = None) -> None:
+    """Display the cached selections in the current data next to a previous vintage.
 
-    fig = px.bar(
-        chart_df_melted,
-        x="Selection",
-        y="Value",
-        color="Category",
-        barmode="relative",  # Changed from 'stack' to 'relative' for proper positive/negative handling
-        title=f"Stacked Bar Chart (Total: {chart_df_melted['Value'].sum():,.0f})",
-        labels={"Selection": "Selections", "Value": "Amount", "Category": "Category"},
-        color_discrete_sequence=distinct_colors
+    Each vintage is converted with the exchange rates saved alongside it.
+    """
+    if not selections:
+        st.warning(MESSAGES['no_data'])
+        return
+
+    try:
+        previous, previous_rates = load_vintage(previous_vintage['dataset'], previous_vintage['rates'])
+    except OSError as e:
+        st.error(f"Error loading vintage: {e}")
+        return
+
+    current_rates = get_rate_table()
+    if exchange_rate_type and exchange_rate_type not in previous_rates.rate_types:
+        st.error(f"The previous vintage has no {exchange_rate_type} rates")
+        return
+
+    diff = get_vintage_diff(dataset, previous)
+    current_values, previous_values = diff.compare(current_rates, previous_rates, exchange_rate_type)
+    summary = diff.summary(current_rates, previous_rates, exchange_rate_type)
+    changed = int(((summary['Changed cases'] > 0) & (summary.index.isin(NUMERIC_COLUMNS))).sum())
+
+    st.info(f"Compared with vintage of **{describe_vintage(previous_vintage)}**: "
+            f"{changed} categories changed, {diff.added} cases added, {diff.removed} cases removed"
+            + (f"; converted using exchange rate: **{exchange_rate_type}**" if exchange_rate_type else ""))
+
+    positions = WelfareQuery(dataset).select(selections).rows()
+    found = positions >= 0
+    current_rows = np.full((len(positions), len(RESULT_COLUMNS)), np.nan)
+    previous_rows = np.full_like(current_rows, np.nan)
+    current_rows[found] = current_values[positions[found]]
+    previous_rows[found] = previous_values[positions[found]]
+
+    selection_labels = get_selection_labels(selections)
+    previous_display, current_display = [
+        shape_display_frame(pd.DataFrame(rows, columns=RESULT_COLUMNS), selection_labels, selected_columns)
+        for rows in (previous_rows, current_rows)
+    ]
+    # Changes are taken between the displayed (signed) values
+    comparison = pd.concat([previous_display, current_display, current_display - previous_display],
+                           axis=1, keys=["Previous", "Current", "Change"])
+    comparison = comparison.swaplevel(axis=1).reindex(columns=selection_labels, level=0)
+
+    st.subheader("Vintage Comparison")
+    st.download_button(
+        label="📥 Download Comparison as CSV",
+        data=comparison.to_csv(),
+        file_name="welfare_vintage_comparison.csv",
+        mime="text/csv",
+        use_container_width=True
     )
+    st.dataframe(comparison, use_container_width=True)
 
-    fig.update_traces(texttemplate='%{y:.1f}', textposition='inside')
-    fig.update_layout(
-        barmode="relative",
-        xaxis_title="Selections",
-        yaxis_title="Amount",
-        yaxis=dict(dtick=200),
-        height=600,
-        hovermode='x unified'
+    with st.expander("Changes Across All Cases"):
+        summary.index = [COLUMN_NAME_MAPPING.get(col, col) for col in summary.index]
+        st.dataframe(summary, use_container_width=True)
+
+def display_scenario_delta(base_name: str, base_selections: list, other_name: str, other_selections: list,
+                           dataset: WelfareDataset, exchange_rate_type: str = None, selected_columns: list = None,
+                           pair_by: str = 'position') -> None:
+    """Display the changes from one scenario's selections to another's, pair by pair."""
+    if not base_selections or not other_selections:
+        st.warning(MESSAGES['no_data'])
+        return
+
+    try:
+        base_values = WelfareQuery(dataset).select(base_selections).columns(*RESULT_COLUMNS).convert(exchange_rate_type).to_frame()
+        other_values = WelfareQuery(dataset).select(other_selections).columns(*RESULT_COLUMNS).convert(exchange_rate_type).to_frame()
+        base_positions, other_positions = pair_selections(base_selections, other_selections, pair_by)
+    except ValueError as e:
+        st.error(f"Error preparing scenario comparison: {e}")
+        return
+
+    if not len(base_positions):
+        st.warning(f"No selections of scenario {base_name} pair with scenario {other_name}.")
+        return
+    st.info(f"Scenario **{other_name}** compared with scenario **{base_name}**: {len(base_positions)} pairs by {pair_by}"
+            + (f", converted using exchange rate: **{exchange_rate_type}**" if exchange_rate_type else ""))
+
+    base_labels = np.array(get_selection_labels(base_selections), dtype=object)[base_positions]
+    other_labels = np.array(get_selection_labels(other_selections), dtype=object)[other_positions]
+    pair_labels = [f"{base_label} → {other_label}" for base_label, other_label in zip(base_labels, other_labels)]
+
+    # Both sides gathered by pair, so the changes are one array subtraction
+    base_display = shape_display_frame(base_values.iloc[base_positions], pair_labels, selected_columns)
+    other_display = shape_display_frame(other_values.iloc[other_positions], pair_labels, selected_columns)
+    delta_display = other_display - base_display
+
+    comparison = pd.concat([base_display, other_display, delta_display], axis=1,
+                           keys=[f"Scenario {base_name}", f"Scenario {other_name}", "Change"])
+    comparison = comparison.swaplevel(axis=1).reindex(columns=pair_labels, level=0)
+
+    st.subheader("Scenario Comparison")
+    st.download_button(
+        label="📥 Download Scenario Comparison as CSV",
+        data=comparison.to_csv(),
+        file_name="welfare_scenario_comparison.csv",
+        mime="text/csv",
+        use_container_width=True
     )
+    st.dataframe(comparison, use_container_width=True)
 
-    import hashlib
-    chart_key = hashlib.md5(str(chart_df_melted.values.tolist()).encode()).hexdigest()[:8]
-    st.plotly_chart(fig, use_container_width=True, key=f"stacked_bar_{chart_key}")
+    st.subheader("Stacked Bar Chart of Changes")
+    display_stacked_bar_chart(delta_display, x_title="Selection pairs")
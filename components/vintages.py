@@ -0,0 +1,204 @@
+"""Immutable versioned snapshots of datasets and rate tables, and the vintage diff engine."""
+
+import json
+import os
+import time
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+from components.data_sources import format_timestamp
+from components.dataset import DIMENSIONS, RESULT_COLUMNS, WelfareDataset, sort_dictionary
+from components.exchange_rates import ExchangeRateTable
+from components.query import convert_result_rows
+from components.snapshot_store import write_atomically
+from constants import NUMERIC_COLUMNS, SNAPSHOT_SETTINGS
+
+MANIFEST_FILE = 'manifest.json'
+
+def get_vintage_path(kind: str, version: str, extension: str) -> str:
+    """Get the file path of a dataset ('datasets') or rate table ('rates') vintage."""
+    return os.path.join(SNAPSHOT_SETTINGS['vintage_dir'], kind, f"{version}.{extension}")
+
+def write_once(path: str, write) -> None:
+    """Write a vintage file unless it exists; files are swapped in atomically and never changed."""
+    if not os.path.exists(path):
+        write_atomically(path, write)
+
+def dataset_to_table(dataset: WelfareDataset) -> pa.Table:
+    """Convert a dataset to an Arrow table: dictionary-encoded dimensions, nullable numeric columns."""
+    columns = {
+        dimension: pa.DictionaryArray.from_arrays(
+            pa.array(dataset.dimension_codes(dimension), type=pa.int16()),
+            pa.array(dataset.categories[dimension], type=pa.string())
+        )
+        for dimension in DIMENSIONS
+    }
+    for i, col in enumerate(NUMERIC_COLUMNS):
+        columns[col] = pa.array(dataset.values[:, i], type=pa.float64(), mask=dataset.missing[:, i])
+    return pa.table(columns).replace_schema_metadata({'version': dataset.version})
+
+def table_to_dataset(table: pa.Table) -> WelfareDataset:
+    """Rebuild a dataset from its Arrow table, keeping its original version."""
+    categories = {}
+    codes = np.empty((table.num_rows, len(DIMENSIONS)), dtype=np.int16)
+    for i, dimension in enumerate(DIMENSIONS):
+        column = table.column(dimension).combine_chunks()
+        categories[dimension], codes[:, i] = sort_dictionary(
+            column.dictionary.to_pylist(), column.indices.to_numpy(zero_copy_only=False)
+        )
+
+    parsed = np.column_stack([
+        table.column(col).to_numpy().astype(float) for col in NUMERIC_COLUMNS
+    ]) if table.num_rows else np.empty((0, len(NUMERIC_COLUMNS)))
+    missing = np.isnan(parsed)
+    values = np.ascontiguousarray(np.where(missing, 0.0, parsed))
+    return WelfareDataset(categories, codes, values, missing, table.schema.metadata[b'version'].decode())
+
+def read_manifest() -> List[Dict[str, Any]]:
+    """Read the list of saved vintages, oldest first."""
+    path = os.path.join(SNAPSHOT_SETTINGS['vintage_dir'], MANIFEST_FILE)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def save_vintage(dataset: WelfareDataset, rate_table: ExchangeRateTable) -> Dict[str, Any]:
+    """Save a dataset and rate table as a vintage, unless that pair is already saved.
+
+    Dataset and rate files are named by their content versions and written
+    only once; the manifest records each (dataset, rates) pair with the time
+    it was first seen.
+
+    Returns:
+        The manifest entry of the vintage
+    """
+    write_once(get_vintage_path('datasets', dataset.version, 'parquet'),
+               lambda path: pq.write_table(dataset_to_table(dataset), path, compression='zstd'))
+    write_once(get_vintage_path('rates', rate_table.version, 'csv'),
+               lambda path: rate_table.to_frame().to_csv(path, index=False))
+
+    manifest = read_manifest()
+    for entry in manifest:
+        if entry['dataset'] == dataset.version and entry['rates'] == rate_table.version:
+            return entry
+
+    entry = {
+        'dataset': dataset.version,
+        'rates': rate_table.version,
+        'saved_at': time.time(),
+        'rows': len(dataset)
+    }
+    manifest.append(entry)
+    def write_manifest(path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+
+    write_atomically(os.path.join(SNAPSHOT_SETTINGS['vintage_dir'], MANIFEST_FILE), write_manifest)
+    return entry
+
+def describe_vintage(entry: Dict[str, Any]) -> str:
+    """Describe a vintage for display."""
+    return f"{format_timestamp(entry['saved_at'])} ({entry['rows']} cases, data {entry['dataset'][:8]}, rates {entry['rates'][:8]})"
+
+@st.cache_resource(max_entries=4)
+def load_vintage(dataset_version: str, rates_version: str) -> Tuple[WelfareDataset, ExchangeRateTable]:
+    """Load the dataset and rate table of a saved vintage."""
+    dataset = table_to_dataset(pq.read_table(get_vintage_path('datasets', dataset_version, 'parquet')))
+    rate_table = ExchangeRateTable(pd.read_csv(get_vintage_path('rates', rates_version, 'csv')))
+    return dataset, rate_table
+
+class VintageDiff:
+    """Alignment of two dataset vintages on the selection key.
+
+    Category codes of the previous vintage are remapped onto the union of
+    both vintages' categories (values only in the previous vintage get codes
+    after the current ones) and each row's codes are packed into one integer
+    key, so rows are
+    matched with a single sorted intersection. The first row of a
+    duplicated key is used, as in WelfareDataset.key_index.
+
+    Attributes:
+        previous_positions: For every current row, its previous row, -1 if it is new
+        added: Number of current keys without a previous row
+        removed: Number of previous keys without a current row
+    """
+
+    def __init__(self, current: WelfareDataset, previous: WelfareDataset):
+        self.current = current
+        self.previous = previous
+
+        sizes = []
+        previous_codes = np.empty_like(previous.codes, dtype=np.intp)
+        for i, dimension in enumerate(DIMENSIONS):
+            # Values missing from the current vintage each get their own code after the current ones
+            codes = dict(current.category_codes[dimension])
+            for value in previous.categories[dimension]:
+                codes.setdefault(value, len(codes))
+            sizes.append(max(len(codes), 1))
+            remap = np.array([codes[value] for value in previous.categories[dimension]], dtype=np.intp)
+            previous_codes[:, i] = remap[previous.codes[:, i]] if len(remap) else 0
+
+        current_keys = np.ravel_multi_index(current.codes.T.astype(np.intp), sizes) if len(current) else np.empty(0, np.intp)
+        previous_keys = np.ravel_multi_index(previous_codes.T, sizes) if len(previous) else np.empty(0, np.intp)
+
+        unique_current, first_current = np.unique(current_keys, return_index=True)
+        unique_previous, first_previous = np.unique(previous_keys, return_index=True)
+        _, in_current, in_previous = np.intersect1d(unique_current, unique_previous, assume_unique=True,
+                                                    return_indices=True)
+
+        # Every current row follows its key's first row
+        matched = np.full(len(unique_current), -1, dtype=np.intp)
+        matched[in_current] = first_previous[in_previous]
+        self.previous_positions = matched[np.searchsorted(unique_current, current_keys)]
+        self.added = len(unique_current) - len(in_current)
+        self.removed = len(unique_previous) - len(in_previous)
+
+    def compare(self, current_rates: ExchangeRateTable, previous_rates: ExchangeRateTable,
+                rate_type: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the current and previous values of every current row, each vintage converted with its own rates.
+
+        Returns:
+            Tuple of (rows x RESULT_COLUMNS) current values and previous
+            values, NaN where missing or where the row is new
+        """
+        current_values, _ = convert_result_rows(
+            self.current, np.where(self.current.result_missing, np.nan, self.current.result_values),
+            rate_type, rate_table=current_rates
+        )
+        previous_values = np.full_like(current_values, np.nan)
+        matched = self.previous_positions >= 0
+        positions = self.previous_positions[matched]
+        previous_values[matched], _ = convert_result_rows(
+            self.previous, np.where(self.previous.result_missing[positions], np.nan, self.previous.result_values[positions]),
+            rate_type, positions, previous_rates
+        )
+        return current_values, previous_values
+
+    def summary(self, current_rates: ExchangeRateTable, previous_rates: ExchangeRateTable,
+                rate_type: Optional[str] = None) -> pd.DataFrame:
+        """Summarize the per-category changes over all matched rows."""
+        current_values, previous_values = self.compare(current_rates, previous_rates, rate_type)
+        delta = current_values - previous_values
+        compared = ~np.isnan(delta)
+        counts = compared.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_change = np.where(counts > 0, np.where(compared, delta, 0.0).sum(axis=0) / counts, np.nan)
+        return pd.DataFrame({
+            'Compared cases': counts,
+            'Changed cases': (np.abs(np.where(compared, delta, 0.0)) > 1e-9).sum(axis=0),
+            'Mean change': mean_change,
+            'Largest change': np.abs(np.where(compared, delta, 0.0)).max(axis=0, initial=0.0)
+        }, index=RESULT_COLUMNS)
+
+@st.cache_resource(max_entries=4)
+def _cached_vintage_diff(_current: WelfareDataset, _previous: WelfareDataset,
+                         current_version: str, previous_version: str) -> VintageDiff:
+    return VintageDiff(_current, _previous)
+
+def get_vintage_diff(current: WelfareDataset, previous: WelfareDataset) -> VintageDiff:
+    """Get the alignment of two vintages, computed once per pair of dataset versions."""
+    return _cached_vintage_diff(current, previous, current.version, previous.version)
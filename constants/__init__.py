@@ -3,11 +3,31 @@
 from .data.columns import (
     NUMERIC_COLUMNS,
     SHEET_URLS,
+    SHEET_SHARDS,
+    SHEET_FETCH_WORKERS,
+    SHEET_REVISION_EDGE_ROWS,
     COLUMN_INDICES,
+    NUMERIC_START_INDEX,
     COLUMN_NAME_MAPPING,
     EXCLUDED_DISPLAY_COLUMNS,
     CLASS_A_BENEFITS,
-    CLASS_B_COSTS
+    CLASS_B_COSTS,
+    DERIVED_COLUMNS,
+    RATIO_COLUMNS
+)
+
+from .data.matrix import (
+    MATRIX_PART_COLUMNS,
+    MATRIX_PART_TOTALS,
+    MATRIX_FAMILY_TYPES,
+    MATRIX_INCOME_CASES,
+    MATRIX_INCOME_GENDERS
+)
+
+from .data.storage import (
+    SNAPSHOT_SETTINGS,
+    DATA_SOURCE,
+    RESULT_CACHE_SETTINGS
 )
 
 from .ui.text import (
@@ -27,6 +47,7 @@ from .ui.styles import (
 
 from .data.country import (
     COUNTRY_NAME,
+    COUNTRY_CODE,
     INCOME_CASE,
     FAMILY_CASES,
     INCOME_GENDER,
@@ -36,11 +57,25 @@ from .data.country import (
 __all__ = [
     'NUMERIC_COLUMNS',
     'SHEET_URLS',
+    'SHEET_SHARDS',
+    'SHEET_FETCH_WORKERS',
+    'SHEET_REVISION_EDGE_ROWS',
     'COLUMN_INDICES',
+    'NUMERIC_START_INDEX',
     'COLUMN_NAME_MAPPING',
     'EXCLUDED_DISPLAY_COLUMNS',
     'CLASS_A_BENEFITS',
     'CLASS_B_COSTS',
+    'DERIVED_COLUMNS',
+    'RATIO_COLUMNS',
+    'MATRIX_PART_COLUMNS',
+    'MATRIX_PART_TOTALS',
+    'MATRIX_FAMILY_TYPES',
+    'MATRIX_INCOME_CASES',
+    'MATRIX_INCOME_GENDERS',
+    'SNAPSHOT_SETTINGS',
+    'DATA_SOURCE',
+    'RESULT_CACHE_SETTINGS',
     'PAGE_TITLES',
     'FEATURES',
     'SELECTION_LABELS',
@@ -51,6 +86,7 @@ __all__ = [
     'LAYOUT',
     'COLORS',
     'COUNTRY_NAME',
+    'COUNTRY_CODE',
     'INCOME_CASE',
     'FAMILY_CASES',
     'INCOME_GENDER',
@@ -46,7 +46,10 @@ COLUMN_NAME_MAPPING = {
     'telecost': 'Telecommunications cost',
     'transportcost': 'Transportation cost',
     'othercosts': 'Other costs',
-    'totalexpense': 'Total Expenses'
+    'totalexpense': 'Total Expenses',
+    'netincome': 'Net disposable income',
+    'replacementrate': 'Replacement rate',
+    'costburden': 'Cost burden share'
 }
 
 # Columns to exclude from display
@@ -88,15 +91,41 @@ CLASS_B_COSTS = [
     'utilitycost',
     'foodcost',
     'telecost',
+    'transportcost',
     'othercosts'
 ]
 
-# Google Sheets URLs
-SHEET_URLS = {
-    'sheet0': 'https://docs.google.com/spreadsheets/d/13TAI7o_WFd71JGlDBh0iCFVkHTeZA8UvTNiNYU0xR6U/edit?gid=0#gid=0',
-    'sheet1': 'https://docs.google.com/spreadsheets/d/1P9wvWrZdNjPSO_vHwElFYPyRdlAtLQXxgZ31FfV0G1s/edit?gid=0#gid=0'
+# Derived columns, computed once from the numeric columns and stored after them:
+# - netincome: Class A benefits minus Class B contributions and costs
+# - replacementrate: Class A benefits other than earnings, relative to earnings
+# - costburden: Class B contributions and costs, relative to Class A benefits
+DERIVED_COLUMNS = ['netincome', 'replacementrate', 'costburden']
+
+# Derived columns that are ratios, so they are never converted with exchange rates
+RATIO_COLUMNS = ['replacementrate', 'costburden']
+
+# Google Sheets shards: each spreadsheet and the worksheets (index or title) to read from it
+SHEET_SHARDS = {
+    'sheet0': {
+        'url': 'https://docs.google.com/spreadsheets/d/13TAI7o_WFd71JGlDBh0iCFVkHTeZA8UvTNiNYU0xR6U/edit?gid=0#gid=0',
+        'worksheets': [0]
+    },
+    'sheet1': {
+        'url': 'https://docs.google.com/spreadsheets/d/1P9wvWrZdNjPSO_vHwElFYPyRdlAtLQXxgZ31FfV0G1s/edit?gid=0#gid=0',
+        'worksheets': [0]
+    }
 }
 
+# Google Sheets URLs
+SHEET_URLS = {name: shard['url'] for name, shard in SHEET_SHARDS.items()}
+
+# Maximum number of shards fetched concurrently
+SHEET_FETCH_WORKERS = 8
+
+# Leading and trailing used rows of each worksheet hashed into the revision
+# marker when Drive metadata is unavailable
+SHEET_REVISION_EDGE_ROWS = 5
+
 # Data column indices
 COLUMN_INDICES = {
     'country': 0,
@@ -105,4 +134,7 @@ COLUMN_INDICES = {
     'incomegender': 4,
     'case': 5,
     'alternative': 6
-} 
\ No newline at end of file
+}
+
+# First worksheet column holding the NUMERIC_COLUMNS values
+NUMERIC_START_INDEX = 7
@@ -267,6 +267,9 @@ COUNTRY_NAME = {
     'ZWE': 'Zimbabwe'
 }
 
+# Reverse lookup of country codes by display name
+COUNTRY_CODE = {name: code for code, name in COUNTRY_NAME.items()}
+
 INCOME_CASE = [
     "",
     "One earner on minimum wage x 16 hours per week",
@@ -276,6 +279,15 @@ INCOME_CASE = [
     "Two earners, one on average and one on half average earnings",
     "No earners - receiving social assistance",
     "One earner on minimum wage full time",
+    "Two earners, both on minimum wage x 16 hours per week",
+    "Two earners, one on minimum wage x 16 hours per week and one on minimum wage full time",
+    "Two earners, one on minimum wage x 16 hours per week and one on half average earnings",
+    "Two earners, one on minimum wage x 16 hours per week and one on average earnings",
+    "Two earners, both on minimum wage full time",
+    "Two earners, one on minimum wage full time and one on half average earnings",
+    "Two earners, one on minimum wage full time and one on average earnings",
+    "Two earners, both on half average earnings",
+    "Two earners, both on average earnings",
 ]
 
 FAMILY_CASES = [
@@ -0,0 +1,56 @@
+"""Constants for parsing upstream Model Family Matrix workbooks."""
+
+# Top-level program rows of each matrix part, in order, mapped onto numeric columns
+MATRIX_PART_COLUMNS = {
+    'PART A': [
+        'earning', 'iliving', 'inutrition', 'iCCare', 'iCBenefit', 'ifertility',
+        'ieducation', 'ihousing', 'imedical', 'iutility', 'itransport', 'isocsec',
+        'itax', 'iwork', 'iunempinsurance', 'iunempsub', 'iother'
+    ],
+    'PART B': [
+        'incometax', 'localtax', 'pension', 'healthinsurance', 'unempinsurance',
+        'othercontribution', 'ccarecost', 'schlcosts', 'healthcost', 'rent',
+        'utilitycost', 'foodcost', 'telecost', 'transportcost', 'othercosts'
+    ]
+}
+
+# Total column computed from the program rows of each matrix part
+MATRIX_PART_TOTALS = {
+    'PART A': 'totalbenefit',
+    'PART B': 'totalexpense'
+}
+
+# Family type code of each 'Type' header label
+MATRIX_FAMILY_TYPES = {
+    'single adult aged 45': 1,
+    'two adults aged 45 (with no child)': 8
+}
+
+# Income case code of each ('Income 1', 'Income 2') header label pair, without
+# their gender remark; 'NA' reads as '' (no second earner). Two-earner pairs
+# match in either order.
+MATRIX_INCOME_CASES = {
+    ('minimum wage x 16 hours per week', ''): 1,
+    ('50% national average wage', ''): 2,
+    ('national average wage', ''): 3,
+    ('national average wage', '50% national average wage'): 5,
+    ('minimum wage x full-time', ''): 7,
+    ('minimum wage x 16 hours per week', 'minimum wage x 16 hours per week'): 8,
+    ('minimum wage x 16 hours per week', 'minimum wage x full-time'): 9,
+    ('minimum wage x 16 hours per week', '50% national average wage'): 10,
+    ('minimum wage x 16 hours per week', 'national average wage'): 11,
+    ('minimum wage x full-time', 'minimum wage x full-time'): 12,
+    ('minimum wage x full-time', '50% national average wage'): 13,
+    ('minimum wage x full-time', 'national average wage'): 14,
+    ('50% national average wage', '50% national average wage'): 15,
+    ('national average wage', 'national average wage'): 16
+}
+
+# Income gender code of the gender remark shared by every earner, e.g. '(Not Gender-Specific)';
+# earners without a remark are 'not applicable'
+MATRIX_INCOME_GENDERS = {
+    'male': 1,
+    'female': 2,
+    'not gender-specific': 3,
+    '': 3
+}
@@ -0,0 +1,23 @@
+"""Constants for local data storage and caching."""
+
+import os
+
+# Local snapshot store for sheet data, and immutable vintages of every dataset and rate table loaded
+SNAPSHOT_SETTINGS = {
+    'cache_dir': os.environ.get('WELFARE_CACHE_DIR', os.path.join('.cache', 'welfare')),
+    'ttl_seconds': int(os.environ.get('WELFARE_SNAPSHOT_TTL', 6 * 60 * 60)),
+    'sheet_snapshot': 'sheet_data',
+    'vintage_dir': os.environ.get('WELFARE_VINTAGE_DIR', os.path.join('data', 'vintages'))
+}
+
+# Data source backend: 'google_sheets', 'csv' (directory of CSV exports) or 'parquet'/'arrow' (local file)
+DATA_SOURCE = {
+    'backend': os.environ.get('WELFARE_DATA_SOURCE', 'google_sheets'),
+    'csv_dir': os.environ.get('WELFARE_CSV_DIR', 'data'),
+    'file_path': os.environ.get('WELFARE_DATA_FILE', os.path.join('data', 'welfare.parquet'))
+}
+
+# Shared LRU cache of per-selection result vectors
+RESULT_CACHE_SETTINGS = {
+    'max_entries': int(os.environ.get('WELFARE_RESULT_CACHE_SIZE', 50000))
+}
@@ -38,7 +38,8 @@ BUTTON_LABELS = {
     'confirm': 'Confirm',
     'delete': 'Delete',
     'show_result': 'Show Result',
-    'get_started': 'Get Started'
+    'get_started': 'Get Started',
+    'refresh_data': 'Refresh Data Now'
 }
 
 # Messages
@@ -48,7 +49,12 @@ MESSAGES = {
     'selection_exists': 'This selection is already cached!',
     'items_deleted': 'Selected items deleted successfully.',
     'all_cleared': 'Cleared all selections.',
-    'no_data': 'No selections cached yet! Please cache your selections before showing the final result.'
+    'no_data': 'No selections cached yet! Please cache your selections before showing the final result.',
+    'data_refreshed': 'Data refreshed from Google Sheets ({} of {} sheet shards changed).',
+    'snapshot_fallback': 'Google Sheets unavailable ({}). Showing data snapshot from {}.',
+    'source_reloaded': 'Data reloaded from source.',
+    'data_source': 'Data source: {}',
+    'result_cache_stats': 'Result cache: {hits} hits, {misses} misses, {entries} of {max_entries} vectors cached'
 }
 
 # Description page content
@@ -0,0 +1,38 @@
+"""Tests for the typed dataset and its derived columns."""
+
+import numpy as np
+import pyarrow as pa
+from components.adjustments import STORED_SIGNS
+from components.dataset import build_dataset, build_dataset_from_table, compute_derived
+from constants import NUMERIC_COLUMNS, NUMERIC_START_INDEX, DERIVED_COLUMNS
+
+def make_values(**cells):
+    values = np.zeros((1, len(NUMERIC_COLUMNS)))
+    for col, value in cells.items():
+        values[0, NUMERIC_COLUMNS.index(col)] = value
+    return values
+
+def test_transport_cost_is_a_cost():
+    derived = compute_derived(make_values(earning=1000.0, rent=-200.0, transportcost=-100.0))
+
+    assert derived[0, DERIVED_COLUMNS.index('netincome')] == 700.0
+    assert derived[0, DERIVED_COLUMNS.index('costburden')] == 0.3
+    assert STORED_SIGNS[NUMERIC_COLUMNS.index('transportcost')] == -1.0
+
+def test_arrow_and_worksheet_rows_get_the_same_version():
+    rows = [
+        ['JPN', 'Japan', '3', '1', '3', '1', '0', '1000'] + [''] * (len(NUMERIC_COLUMNS) - 1),
+        ['AUS', 'Australia', '1', '8', '3', '1', '0', '2500.5'] + ['-10'] * (len(NUMERIC_COLUMNS) - 1)
+    ]
+    table = pa.table({
+        f"c{i}": pa.array([row[i] for row in rows]) if i < NUMERIC_START_INDEX
+        else pa.array([float(row[i]) if row[i] else None for row in rows], type=pa.float64())
+        for i in range(len(rows[0]))
+    })
+
+    from_rows = build_dataset(rows)
+    from_table = build_dataset_from_table(table)
+
+    assert from_table.categories == from_rows.categories
+    assert np.array_equal(from_table.values, from_rows.values)
+    assert from_table.version == from_rows.version
@@ -0,0 +1,19 @@
+"""Tests for the Model Family Matrix parser."""
+
+import os
+from components.matrix_parser import derive_block_codes, iter_matrix_file, record_key
+
+EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'example-data.csv')
+
+def test_example_blocks_have_labelled_distinct_keys():
+    keys = [record_key(dimensions) for dimensions, _ in iter_matrix_file(EXAMPLE_PATH)]
+
+    assert len(keys) == 12
+    assert len(set(keys)) == 12
+    assert all(code != '0' for key in keys for code in key[1:4])
+
+def test_earners_without_gender_remark_are_not_applicable():
+    assert derive_block_codes('Two adults aged 45 (with no child)',
+                              'Minimum wage x 16 hours per week', 'Minimum wage x Full-time') == (9, 8, 3)
+    assert derive_block_codes('Two adults aged 45 (with no child)',
+                              'Minimum wage x Full-time', 'National Average Wage (Female)') == (14, 8, 2)
@@ -0,0 +1,28 @@
+"""Tests for the vintage diff engine."""
+
+from components.dataset import build_dataset
+from components.vintages import VintageDiff
+from constants import NUMERIC_COLUMNS
+
+def make_row(country, case='1', earning='1000'):
+    return [country, '', '1', '1', '3', case, '0', earning] + ['0'] * (len(NUMERIC_COLUMNS) - 1)
+
+def test_removed_counts_every_dropped_country():
+    previous = build_dataset([make_row(country) for country in ('AUS', 'AUT', 'JPN')])
+    current = build_dataset([make_row('JPN', earning='1200')])
+
+    diff = VintageDiff(current, previous)
+
+    assert diff.removed == 2
+    assert diff.added == 0
+    assert list(diff.previous_positions) == [2]
+
+def test_added_and_removed_keys_in_a_shared_dimension():
+    previous = build_dataset([make_row('JPN', case) for case in ('1', '2', '3')])
+    current = build_dataset([make_row('JPN', case) for case in ('1', '4')])
+
+    diff = VintageDiff(current, previous)
+
+    assert diff.removed == 2
+    assert diff.added == 1
+    assert list(diff.previous_positions) == [0, -1]